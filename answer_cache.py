@@ -0,0 +1,217 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from tracing import get_tracer
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """
+    Lowercases, collapses whitespace and drops trailing punctuation so that
+    trivially different phrasings share an exact-cache entry.
+    """
+    return _WHITESPACE.sub(" ", query.lower()).strip().rstrip("?!. ")
+
+
+class Miss:
+    """
+    Returned by AnswerCache.lookup() on a miss: the corpus version the lookup
+    saw and the query embedding, if one was computed.
+    """
+    __slots__ = ("version", "vector")
+
+    def __init__(self, version, vector):
+        self.version = version
+        self.vector = vector
+
+
+class AnswerCache:
+    """
+    Two-tier cache of pipeline answers.
+
+    The exact tier is keyed by normalized query, metadata filter and corpus
+    version. If an encoder is given, a semantic tier also returns the answer
+    of a cached query (with the same filter) whose embedding has cosine
+    similarity >= similarity_threshold with the new one.
+
+    Entries are evicted least recently used beyond max_entries and expire
+    after ttl seconds. version_fn, if given, is called on each lookup (e.g.
+    lambda: store.version) and the whole cache is dropped when it changes.
+    Hits and misses are also counted on the tracer (answer_cache.*).
+
+    Pipelines call lookup() and hand the returned Miss to put(), so an answer
+    is only stored if the corpus version it was computed against is still
+    current, and the query is embedded once per miss.
+    """
+    def __init__(self, max_entries=1024, ttl=3600.0, encoder=None, similarity_threshold=0.95,
+                 version_fn=None, clock=time.monotonic, tracer=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.encoder = encoder
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+        self.clock = clock
+        self.tracer = tracer
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (answer, expires_at, slot)
+        self._vectors = None  # (max_entries, dim) unit query embeddings, by slot
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, query, metadata_filter=None):
+        """
+        Returns a cached answer or None.
+        """
+        return self.lookup(query, metadata_filter)[0]
+
+    def lookup(self, query, metadata_filter=None):
+        """
+        Returns (answer, None) on a hit and (None, Miss) on a miss.
+        """
+        answer, version = self.get_exact(query, metadata_filter)
+        if answer is not None:
+            return answer, None
+        return self.get_semantic(query, metadata_filter, version)
+
+    def get_exact(self, query, metadata_filter=None):
+        """
+        Checks the exact tier only, without embedding the query. Returns
+        (answer or None, corpus version seen); pass the version on to
+        get_semantic() to complete the lookup.
+        """
+        key = self._key(query, metadata_filter)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    (self.tracer or get_tracer()).count("answer_cache.exact_hit")
+                    return entry[0], self._version
+                self._evict(key)
+            return None, self._version
+
+    def get_semantic(self, query, metadata_filter, version):
+        """
+        Checks the semantic tier after a get_exact() miss. Returns (answer,
+        None) on a hit and (None, Miss) on a miss.
+        """
+        vector = None
+        if self.encoder is not None and self._vectors is not None:
+            vector = self._embed(query)
+            answer = self._semantic_get(vector, self._key(query, metadata_filter)[1])
+            if answer is not None:
+                (self.tracer or get_tracer()).count("answer_cache.semantic_hit")
+                return answer, None
+        with self._lock:
+            self.misses += 1
+        (self.tracer or get_tracer()).count("answer_cache.miss")
+        return None, Miss(version, vector)
+
+    def put(self, query, answer, metadata_filter=None, miss=None):
+        """
+        Stores an answer for query.
+
+        miss is what lookup() returned for this query: the answer is dropped
+        if the corpus version changed since, and its query embedding is
+        reused. Without it the answer is stored under the current version.
+        """
+        key = self._key(query, metadata_filter)
+        vector = miss.vector if miss is not None else None
+        if vector is None and self.encoder is not None:
+            vector = self._embed(query)
+        with self._lock:
+            self._check_version()
+            if miss is not None and miss.version != self._version:
+                (self.tracer or get_tracer()).count("answer_cache.stale_put")
+                return
+            if key in self._entries:
+                self._evict(key)
+            while len(self._entries) >= self.max_entries:
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+            slot = self._free_slots.pop()
+            if vector is not None:
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, len(vector)), dtype="float32")
+                self._vectors[slot] = vector
+            self._slot_keys[slot] = key
+            self._entries[key] = (answer, self.clock() + self.ttl, slot)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the overall hit rate.
+        """
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+        }
+
+    def _semantic_get(self, vector, filter_key):
+        with self._lock:
+            similarities = self._vectors @ vector
+            now = self.clock()
+            for slot in np.argsort(-similarities).tolist():
+                if similarities[slot] < self.similarity_threshold:
+                    return None
+                key = self._slot_keys[slot]
+                if key is None or key[1] != filter_key:
+                    continue
+                answer, expires_at, _ = self._entries[key]
+                if expires_at <= now:
+                    continue
+                self._entries.move_to_end(key)
+                self.semantic_hits += 1
+                return answer
+        return None
+
+    def _embed(self, query):
+        vector = np.asarray(self.encoder.encode([query]), dtype="float32")[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _key(self, query, metadata_filter):
+        filter_key = json.dumps(metadata_filter or {}, sort_keys=True, default=str)
+        return normalize_query(query), filter_key
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            if self._version is not None and self._entries:
+                self.invalidations += 1
+                for key in list(self._entries):
+                    self._evict(key)
+            self._version = version
+
+    def _evict(self, key):
+        _, _, slot = self._entries.pop(key)
+        self._slot_keys[slot] = None
+        if self._vectors is not None:
+            self._vectors[slot] = 0.0
+        self._free_slots.append(slot)
@@ -0,0 +1,96 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncExecutor:
+    """
+    Bridges the synchronous pipeline stages into asyncio.
+
+    Blocking work (encoding, FAISS search, generation) runs on a bounded
+    worker pool so the event loop keeps serving other requests. admit() caps
+    the number of requests in flight; extra requests wait for a slot, which
+    gives backpressure instead of an ever-growing backlog. Cancelling the
+    awaiting task (e.g. via asyncio.wait_for) abandons its stages; stages not
+    yet started on the pool are dropped.
+
+    The pool is a thread pool: pipeline stages are bound methods sharing
+    locks and loaded models, which a process pool could not pickle.
+    """
+    def __init__(self, max_workers=8, max_in_flight=64):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_in_flight = max_in_flight
+        self._admission = weakref.WeakKeyDictionary()  # event loop -> Semaphore
+
+    def admit(self):
+        """
+        Async context manager holding one in-flight request slot.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._admission.get(loop)
+        if semaphore is None:
+            semaphore = self._admission[loop] = asyncio.Semaphore(self.max_in_flight)
+        return semaphore
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs a blocking callable on the worker pool and awaits its result.
+
+        The callable runs in a copy of the caller's context, so e.g. tracing
+        spans opened around it become its parents.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        return await loop.run_in_executor(self.pool, call)
+
+    async def cached(self, cache, query, metadata_filter, compute):
+        """
+        Returns a cached answer, or awaits compute() and caches its result.
+
+        The exact tier is checked inline, as it is a dictionary lookup. Only
+        on a miss, and only when the cache has a semantic tier (whose lookup
+        needs an embedding), is compute() started alongside the semantic
+        lookup and cancelled if that hits.
+        """
+        if cache is None:
+            return await compute()
+        cached, version = cache.get_exact(query, metadata_filter)
+        if cached is not None:
+            return cached
+        if cache.encoder is None:
+            cached, miss = cache.get_semantic(query, metadata_filter, version)
+            response = await compute()
+        else:
+            work = asyncio.ensure_future(compute())
+            try:
+                cached, miss = await self.run(cache.get_semantic, query, metadata_filter, version)
+            except BaseException:
+                work.cancel()
+                raise
+            if cached is not None:
+                work.cancel()
+                return cached
+            response = await work
+        await self.run(cache.put, query, response, metadata_filter, miss)
+        return response
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def default_executor():
+    """
+    Returns the process-wide AsyncExecutor used when arun() is given none.
+    """
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = AsyncExecutor()
+        return _default_executor
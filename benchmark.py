@@ -0,0 +1,339 @@
+"""
+Offline benchmark for chunking, indexing and retrieval.
+
+Everything runs without network access: the corpus is generated from a seeded
+Zipf-distributed vocabulary and embedded with the deterministic
+HashingEmbedder, so two runs on the same machine measure the same work.
+
+For each corpus size it reports:
+
+    chunking     chars/s and chunks/s of split_text and each iter_chunks boundary
+    indexing     embed and add throughput into a flat VectorStore
+    queries      p50/p95/p99 latency of BM25, dense, hybrid and end-to-end search
+    recall       recall@k and latency of each approximate index against flat
+    codecs       bytes per vector and recall@k of each vector codec, with and
+                 without exact re-ranking
+    memory       peak RSS of the process so far (sizes run smallest first)
+
+Results are written as JSON. Given --baseline, metrics that got worse by more
+than --tolerance are listed and the exit status is non-zero.
+
+Usage:
+    python benchmark.py [--sizes 1000 10000] [--output bench.json] [--baseline old.json]
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from embedding import HashingEmbedder
+from encoder import BatchEncoder
+from hybrid_retriever import HybridRetriever
+from sparse_retriever import BM25Retriever
+from text_splitter import iter_chunks, split_text
+from vector_store import CODECS, VectorStore, compare_codecs, faiss
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+APPROXIMATE_INDEXES = ("ivf_flat", "ivf_pq", "hnsw")
+
+
+def synthetic_corpus(num_chunks, chunk_size=500, vocab_size=20_000, seed=0):
+    """
+    Returns pages of pseudo-text that split into roughly num_chunks chunks.
+
+    Words are drawn from a Zipf distribution over a fixed vocabulary and
+    grouped into sentences, so term statistics resemble natural text.
+    """
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+             for _ in range(vocab_size)]
+    cum_weights = np.cumsum(1.0 / np.arange(1, vocab_size + 1)).tolist()
+    page_chars = 3000
+    num_pages = max(1, math.ceil(num_chunks * (chunk_size - 50) / page_chars))
+    pages = []
+    for _ in range(num_pages):
+        sentences, length = [], 0
+        while length < page_chars:
+            words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(6, 20))
+            sentence = " ".join(words).capitalize() + "."
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        pages.append(" ".join(sentences))
+    return pages
+
+
+def synthetic_queries(chunks, num_queries, words=6, seed=1):
+    """
+    Returns queries made of a few consecutive words from randomly chosen chunks.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        tokens = rng.choice(chunks).split()
+        start = rng.randint(0, max(0, len(tokens) - words))
+        queries.append(" ".join(tokens[start:start + words]))
+    return queries
+
+
+def latency_summary(seconds):
+    """
+    Returns p50/p95/p99 and mean of per-call latencies, in milliseconds.
+    """
+    samples = np.asarray(seconds, dtype="float64") * 1000.0
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "mean_ms": float(samples.mean())}
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MiB, or None.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _time_each(fn, inputs):
+    timings = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        timings.append(time.perf_counter() - started)
+    return latency_summary(timings)
+
+
+def bench_chunking(pages, chunk_size=500, overlap=50):
+    chars = sum(len(page) for page in pages)
+    results = {}
+    text = "\n".join(pages)
+    chunks, elapsed = _timed(split_text, text, chunk_size, overlap)
+    results["split_text"] = {"chars_per_s": chars / elapsed, "chunks_per_s": len(chunks) / elapsed,
+                             "chunks": len(chunks)}
+    for boundary in ("char", "token", "sentence"):
+        chunks, elapsed = _timed(lambda: [chunk.text for chunk in iter_chunks(
+            pages, chunk_size=chunk_size, overlap=overlap, boundary=boundary)])
+        results[f"iter_chunks_{boundary}"] = {"chars_per_s": chars / elapsed,
+                                              "chunks_per_s": len(chunks) / elapsed,
+                                              "chunks": len(chunks)}
+    return results
+
+
+def bench_indexing(encoder, chunks):
+    vectors, embed_seconds = _timed(encoder.encode, chunks)
+    vectors = np.asarray(vectors, dtype="float32")
+    store = VectorStore(vectors.shape[1])
+    _, add_seconds = _timed(store.add_embeddings, vectors, chunks)
+    return store, vectors, {
+        "embed_chunks_per_s": len(chunks) / embed_seconds,
+        "add_vectors_per_s": len(chunks) / add_seconds,
+    }
+
+
+def bench_queries(store, encoder, chunks, queries, top_k=5):
+    bm25, build_seconds = _timed(BM25Retriever, chunks, top_k=top_k)
+    query_vectors = np.asarray(encoder.encode(queries), dtype="float32")
+    hybrid = HybridRetriever.from_documents(chunks, encoder, vector_store=store, top_k=top_k)
+    try:
+        return {
+            "bm25_build_seconds": build_seconds,
+            "bm25": _time_each(bm25.search, queries),
+            "dense": _time_each(lambda vector: store.search_batch(vector[None, :], top_k), query_vectors),
+            "hybrid": _time_each(hybrid.search, queries),
+            "end_to_end": _time_each(
+                lambda query: store.search(np.asarray(encoder.encode([query]), dtype="float32")[0], top_k),
+                queries),
+        }
+    finally:
+        hybrid.close()
+
+
+def bench_recall(vectors, query_vectors, top_k=10):
+    """
+    Builds each approximate index over vectors and measures recall@top_k
+    against exact search, sweeping its search-time knob.
+    """
+    n, dim = vectors.shape
+    # FAISS wants about 39 training points per centroid
+    nlist = max(1, min(1024, int(math.sqrt(n)), n // 39))
+    pq_nbits = min(8, int(math.log2(max(n // 39, 1))))
+    configs = {
+        "ivf_flat": {"nlist": nlist},
+        "ivf_pq": {"nlist": nlist, "pq_m": 16 if dim % 16 == 0 else 8, "pq_nbits": pq_nbits},
+        "hnsw": {},
+    }
+    results = {}
+    for index_type in APPROXIMATE_INDEXES:
+        if index_type == "ivf_pq" and pq_nbits < 4:
+            continue  # too few vectors to train PQ codebooks
+        store = VectorStore(dim, index_type, train_size=n, **configs[index_type])
+        _, build_seconds = _timed(store.add_embeddings, vectors, [""] * n)
+        sweep = store.tune(vectors, query_vectors, top_k, values=(1, 4, 16, 64))
+        results[index_type] = {"build_seconds": build_seconds, "params": configs[index_type],
+                               "sweep": sweep}
+    return results
+
+
+def bench_codecs(vectors, query_vectors, top_k=10, rerank_factor=4):
+    """
+    Compares the footprint and recall@top_k of each codec on a flat index.
+    """
+    pq_nbits = min(8, int(math.log2(max(len(vectors) // 39, 1))))
+    codecs = [codec for codec in CODECS if codec != "pq" or pq_nbits >= 4]
+    report = compare_codecs(vectors, query_vectors, "flat", codecs, top_k, rerank_factor,
+                            pq_m=16 if vectors.shape[1] % 16 == 0 else 8, pq_nbits=pq_nbits)
+    return {entry.pop("codec"): entry for entry in report}
+
+
+def run(sizes=(1_000, 10_000), num_queries=200, dim=384, top_k=5, recall_k=10, seed=0):
+    """
+    Runs the benchmark for each corpus size and returns the results.
+    """
+    encoder = BatchEncoder(HashingEmbedder(dim=dim, seed=seed))
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "faiss": getattr(faiss, "__version__", None),
+            "dim": dim, "top_k": top_k, "recall_k": recall_k,
+            "num_queries": num_queries, "seed": seed,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "sizes": {},
+    }
+    for size in sorted(sizes):
+        pages = synthetic_corpus(size, seed=seed)
+        chunking = bench_chunking(pages)
+        chunks = [chunk.text for chunk in iter_chunks(pages)][:size]
+        queries = synthetic_queries(chunks, num_queries, seed=seed + 1)
+        store, vectors, indexing = bench_indexing(encoder, chunks)
+        query_vectors = np.asarray(encoder.encode(queries), dtype="float32")
+        results["sizes"][str(size)] = {
+            "chunks": len(chunks),
+            "chunking": chunking,
+            "indexing": indexing,
+            "queries": bench_queries(store, encoder, chunks, queries, top_k),
+            "recall": bench_recall(vectors, query_vectors, recall_k),
+            "codecs": bench_codecs(vectors, query_vectors, recall_k),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    return results
+
+
+def flatten(results, prefix=""):
+    """
+    Flattens nested results into {"a.b.c": number}; lists are indexed by position.
+    """
+    flat = {}
+    items = results.items() if isinstance(results, dict) else enumerate(results)
+    for key, value in items:
+        path = f"{prefix}{key}"
+        if isinstance(value, (dict, list)):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def _higher_is_better(metric):
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("per_s") or name.startswith("recall"):
+        return True
+    if name.endswith("_ms") or name.endswith("seconds") or name in ("peak_rss_mb", "bytes_per_vector"):
+        return False
+    return None  # counts and parameters are not compared
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Returns the metrics that regressed by more than tolerance (relative)
+    against baseline, as (metric, baseline value, current value) tuples.
+    """
+    current, previous = flatten(results["sizes"]), flatten(baseline["sizes"])
+    regressions = []
+    for metric, old in sorted(previous.items()):
+        new = current.get(metric)
+        direction = _higher_is_better(metric)
+        if new is None or direction is None or old == 0:
+            continue
+        change = (new - old) / abs(old)
+        if (direction and change < -tolerance) or (not direction and change > tolerance):
+            regressions.append((metric, old, new))
+    return regressions
+
+
+def print_summary(results):
+    for size, result in results["sizes"].items():
+        print(f"== {size} chunks (peak RSS {result['peak_rss_mb'] or float('nan'):.0f} MiB)")
+        for name, stats in result["chunking"].items():
+            print(f"  chunking {name:<22} {stats['chars_per_s'] / 1e6:8.2f} Mchar/s")
+        indexing = result["indexing"]
+        print(f"  embed {indexing['embed_chunks_per_s']:10.0f} chunks/s   "
+              f"add {indexing['add_vectors_per_s']:10.0f} vectors/s")
+        for name, stats in result["queries"].items():
+            if isinstance(stats, dict):
+                print(f"  query {name:<11} p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f}  "
+                      f"p99 {stats['p99_ms']:7.2f} ms")
+        for index_type, stats in result["recall"].items():
+            points = ", ".join(f"{point['recall']:.3f}@{point['nprobe'] or point['ef_search']}"
+                               for point in stats["sweep"])
+            print(f"  recall {index_type:<9} {points}")
+        for codec, stats in result["codecs"].items():
+            print(f"  codec {codec:<8} {stats['bytes_per_vector']:5d} B/vector  recall {stats['recall']:.3f}  "
+                  f"re-ranked {stats.get('recall_reranked', float('nan')):.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chunking, indexing and retrieval offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000],
+                        help="corpus sizes in chunks")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--recall-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.queries, args.dim, args.top_k, args.recall_k, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for metric, old, new in regressions:
+            print(f"REGRESSION {metric}: {old:.4g} -> {new:.4g}")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
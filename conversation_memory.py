@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from encoder import approximate_token_count
+
+
+def first_sentence(text: str) -> str:
+    text = text.strip()
+    end = text.find(". ")
+    return text if end < 0 else text[:end + 1]
+
+
+class ConversationMemory:
+    """
+    Token-bounded conversation history.
+
+    The most recent turns are kept verbatim up to window_tokens (and at most
+    max_turns turns). Older turns are folded into a rolling summary of at
+    most summary_tokens, so memory size does not grow with session length.
+
+    summarizer(summary, turns) -> str condenses evicted (question, answer)
+    turns into the running summary, e.g. with an LLM call. It is only called
+    with the turns that just left the window. The default keeps each question
+    and the first sentence of its answer, dropping the oldest lines once the
+    summary is over budget.
+    """
+    def __init__(self, window_tokens: int = 1024, summary_tokens: int = 256, max_turns: int = 8,
+                 summarizer: Optional[Callable[[str, List[Tuple[str, str]]], str]] = None,
+                 count_tokens: Callable[[str], int] = approximate_token_count):
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turns = max_turns
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.turns = deque()  # (question, answer, tokens), oldest first
+        self._window_used = 0
+        self._summary_lines = deque()  # (line, tokens), used by the default summarizer
+        self._summary_used = 0
+        self._summary = ""
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    def add_turn(self, question: str, answer: str):
+        """
+        Records a completed turn, moving the oldest turns into the summary
+        when the window is over budget.
+        """
+        tokens = self.count_tokens(question) + self.count_tokens(answer)
+        self.turns.append((question, answer, tokens))
+        self._window_used += tokens
+        evicted = []
+        while self.turns and (self._window_used > self.window_tokens or len(self.turns) > self.max_turns):
+            old_question, old_answer, old_tokens = self.turns.popleft()
+            self._window_used -= old_tokens
+            evicted.append((old_question, old_answer))
+        if evicted:
+            self._condense(evicted)
+
+    def history(self) -> List[Tuple[str, str]]:
+        return [(question, answer) for question, answer, _ in self.turns]
+
+    def tokens(self) -> int:
+        """
+        Tokens currently held by the summary and the recent-turn window.
+        """
+        summary_tokens = self.count_tokens(self._summary) if self._summary else 0
+        return summary_tokens + self._window_used
+
+    def clear(self):
+        self.turns.clear()
+        self._window_used = 0
+        self._summary_lines.clear()
+        self._summary_used = 0
+        self._summary = ""
+
+    def _condense(self, turns):
+        if self.summarizer is not None:
+            self._summary = _clip(self.summarizer(self._summary, turns), self.summary_tokens, self.count_tokens)
+            return
+        for question, answer in turns:
+            line = f"User asked: {question.strip()} Answer: {first_sentence(answer)}"
+            tokens = self.count_tokens(line)
+            self._summary_lines.append((line, tokens))
+            self._summary_used += tokens
+        while self._summary_lines and self._summary_used > self.summary_tokens:
+            _, tokens = self._summary_lines.popleft()
+            self._summary_used -= tokens
+        self._summary = "\n".join(line for line, _ in self._summary_lines)
+
+
+class ContextAssembler:
+    """
+    Builds prompts that fit in max_tokens.
+
+    The question, conversation summary and recent turns from memory come
+    first; the rest of the budget is packed greedily with retrieved chunks in
+    descending score order, skipping chunks that no longer fit. Because
+    memory is itself bounded, the prompt size stays flat however long the
+    session runs.
+    """
+    def __init__(self, memory: ConversationMemory, max_tokens: int = 3000,
+                 instructions: str = "Answer the question using the context and the conversation so far.",
+                 count_tokens: Callable[[str], int] = approximate_token_count):
+        self.memory = memory
+        self.max_tokens = max_tokens
+        self.instructions = instructions
+        self.count_tokens = count_tokens
+
+    def pack_chunks(self, scored_chunks: Sequence[Tuple[str, float]], budget: int) -> List[str]:
+        """
+        Returns the highest-scoring chunks whose total size fits in budget,
+        in score order. Scores are similarities, higher is better.
+        """
+        packed = []
+        for text, _ in sorted(scored_chunks, key=lambda item: item[1], reverse=True):
+            tokens = self.count_tokens(text) + 1  # + separator
+            if tokens <= budget:
+                packed.append(text)
+                budget -= tokens
+        return packed
+
+    def build(self, question: str, scored_chunks: Sequence[Tuple[str, float]] = ()) -> str:
+        """
+        Returns the prompt for question given (chunk text, score) pairs.
+        """
+        parts = [self.instructions]
+        if self.memory.summary:
+            parts.append("Conversation summary:\n" + self.memory.summary)
+        history = self.memory.history()
+        if history:
+            parts.append("Recent conversation:\n" + "\n".join(
+                f"User: {q}\nAssistant: {a}" for q, a in history))
+        tail = f"Question: {question}"
+        used = sum(self.count_tokens(part) for part in parts) + self.count_tokens(tail)
+        header = "Context:\n"
+        used += self.count_tokens(header) + len(parts)  # + separators
+        chunks = self.pack_chunks(scored_chunks, max(self.max_tokens - used, 0))
+        if chunks:
+            parts.append(header + "\n\n".join(chunks))
+        parts.append(tail)
+        return "\n\n".join(parts)
+
+
+def _clip(text, max_tokens, count_tokens):
+    # Keeps the end of an over-long summary, which covers the latest turns
+    while text and count_tokens(text) > max_tokens:
+        text = text[len(text) // 8 + 1:]
+    return text
@@ -0,0 +1,111 @@
+import hashlib
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text, size=5):
+    """
+    Returns the set of word size-grams of text, lowercased. Texts shorter
+    than size words yield a single shingle.
+    """
+    words = normalize_text(text).lower().split(" ")
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashDeduplicator:
+    """
+    Finds exact and near-duplicate texts.
+
+    Exact duplicates (after whitespace normalization) are found by hash.
+    Near-duplicates are found with MinHash signatures over word shingles and
+    banded LSH: texts sharing any band bucket are compared by signature
+    agreement, an estimate of their Jaccard similarity, and count as
+    duplicates at or above threshold. bands must divide num_perm; more bands
+    find lower-similarity pairs at the cost of more comparisons.
+
+    Hashing is deterministic (CRC32 plus seeded universal hashing), so the
+    same input always deduplicates the same way.
+    """
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=5, seed=0):
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype="uint64") | np.uint64(1)  # odd multipliers
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype="uint64")
+        self.reset()
+
+    def reset(self):
+        self._exact = {}  # digest -> canonical key
+        self._buckets = defaultdict(list)  # (band, band bytes) -> canonical keys
+        self._signatures = {}  # canonical key -> signature
+
+    def signature(self, text):
+        """
+        Returns the MinHash signature of text as a uint32 array of num_perm values.
+        """
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)),
+                             dtype="uint64")
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) & _MASK32
+        return permuted.min(axis=1).astype("uint32")
+
+    def add(self, key, text):
+        """
+        Registers text under key unless it duplicates an earlier text.
+
+        Returns the key of the earlier text it duplicates, or None if text
+        was new and is now canonical itself.
+        """
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).digest()
+        canonical = self._exact.get(digest)
+        if canonical is not None:
+            return canonical
+
+        signature = self.signature(text)
+        rows = self.num_perm // self.bands
+        band_keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+        seen = set()
+        for band_key in band_keys:
+            for candidate in self._buckets.get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    self._exact[digest] = candidate
+                    return candidate
+
+        self._exact[digest] = key
+        self._signatures[key] = signature
+        for band_key in band_keys:
+            self._buckets[band_key].append(key)
+        return None
+
+
+def group_duplicates(chunks, deduplicator):
+    """
+    Groups text_splitter.Chunk objects into (canonical chunk, [duplicates])
+    pairs, in order of first occurrence. The deduplicator is reset first, so
+    only chunks within this call are compared.
+    """
+    deduplicator.reset()
+    groups = []
+    position = {}  # canonical key -> index in groups
+    for i, chunk in enumerate(chunks):
+        canonical = deduplicator.add(i, chunk.text)
+        if canonical is None:
+            position[i] = len(groups)
+            groups.append((chunk, []))
+        else:
+            groups[position[canonical]][1].append(chunk)
+    return groups
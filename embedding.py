@@ -1,8 +1,83 @@
-from sentence_transformers import SentenceTransformer
+import hashlib
+import re
+
+import threading
+
+import numpy as np
+
+from lazy_import import LazyModule
+
+sentence_transformers = LazyModule("sentence_transformers")  # pulls in torch; imported on first use
+
+_models = {}
+_models_lock = threading.Lock()
 
 def load_embedding_model(model_name="all-MiniLM-L6-v2"):
     """
     Loads a sentence transformer model for generating embeddings.
     """
-    model = SentenceTransformer(model_name)
-    return model
\ No newline at end of file
+    model = sentence_transformers.SentenceTransformer(model_name)
+    return model
+
+def get_embedding_model(model_name="all-MiniLM-L6-v2"):
+    """
+    Returns a process-wide model instance, loading it on the first call.
+    """
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = load_embedding_model(model_name)
+        return model
+
+class HashingEmbedder:
+    """
+    Deterministic stand-in for a SentenceTransformer.
+
+    Each lowercase word is hashed to a signed bucket of a fixed-size vector and
+    the result is L2-normalized. No weights are downloaded, so tests and
+    benchmarks get stable, offline embeddings with the same encode() interface.
+    """
+    _TOKEN = re.compile(r"\w+")
+
+    def __init__(self, dim=384, seed=0):
+        self.dim = dim
+        self.seed = seed.to_bytes(8, "little", signed=True)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        vectors = np.zeros((len(sentences), self.dim), dtype="float32")
+        for row, sentence in enumerate(sentences):
+            for token in self._TOKEN.findall(sentence.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8, key=self.seed).digest()
+                bucket = int.from_bytes(digest, "little")
+                vectors[row, bucket % self.dim] += 1.0 if bucket & (1 << 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors[0] if single else vectors
+
+def encode_with_cache(model, texts, cache, **encode_kwargs):
+    """
+    Encodes texts, reusing vectors stored in an EmbeddingCache.
+    Only chunks missing from the cache are sent through the model.
+    """
+    hit_positions, hit_vectors, missing = cache.lookup(texts)
+    if not missing:
+        return hit_vectors
+
+    # Encode each distinct missing text once
+    unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+    fresh = np.asarray(model.encode(unique_texts, convert_to_numpy=True, **encode_kwargs), dtype="float32")
+    cache.put(unique_texts, fresh)
+    fresh_by_text = dict(zip(unique_texts, fresh))
+
+    vectors = np.empty((len(texts), fresh.shape[1]), dtype="float32")
+    if hit_positions:
+        vectors[hit_positions] = hit_vectors
+    for position in missing:
+        vectors[position] = fresh_by_text[texts[position]]
+    return vectors
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Collapses whitespace so trivially re-flowed chunks share a cache entry.
+    """
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(model_name, text):
+    """
+    Returns the 20-byte content address of a chunk for a given model.
+    """
+    payload = model_name.encode("utf-8") + b"\0" + normalize_text(text).encode("utf-8")
+    return hashlib.sha1(payload).digest()
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, content-addressed cache of embedding vectors.
+
+    Vectors live in a memory-mapped float32 array of `capacity` rows and a small
+    key index maps content hashes to rows. When full, the least recently used
+    entry is evicted. Call flush() (or close()) to persist the key index.
+
+    Each row's key is also written through a memory map next to its vector,
+    so an index left stale by a crash between put() and flush() cannot hand
+    out a reused row's vector under the key it used to hold. The index files
+    are each replaced whole by flush(), and one that is missing, torn or out
+    of step with the others loads as an empty cache.
+    """
+    VECTORS_FILE = "vectors.npy"
+    ROW_KEYS_FILE = "row_keys.npy"
+    KEYS_FILE = "keys.npy"
+    SLOTS_FILE = "slots.npy"
+    META_FILE = "meta.json"
+    KEY_SIZE = 20
+
+    def __init__(self, path, model_name, capacity=100_000):
+        self.path = os.path.join(path, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.model_name = model_name
+        self.capacity = capacity
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self._slots = OrderedDict()  # key -> row, least recently used first
+        self._vectors = None
+        self._row_keys = None  # (capacity, KEY_SIZE) uint8, the key each row holds
+        self._free_rows = []  # rows below _next_row that hold no entry
+        self._next_row = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def lookup(self, texts):
+        """
+        Looks up cached vectors for texts.
+
+        Returns (hit_positions, hit_vectors, missing_positions), where the
+        positions index into texts and hit_vectors has one row per hit.
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        hit_positions, rows, missing = [], [], []
+        with self._lock:
+            for position, key in enumerate(keys):
+                row = self._slots.get(key)
+                if row is None:
+                    missing.append(position)
+                else:
+                    self._slots.move_to_end(key)
+                    hit_positions.append(position)
+                    rows.append(row)
+            self.hits += len(hit_positions)
+            self.misses += len(missing)
+            if rows:
+                hit_vectors = np.array(self._vectors[rows])
+            else:
+                hit_vectors = np.empty((0, self.dim or 0), dtype="float32")
+        return hit_positions, hit_vectors, missing
+
+    def put(self, texts, vectors):
+        """
+        Stores vectors for texts, evicting least recently used entries if full.
+        """
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._create(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+            for text, vector in zip(texts, vectors):
+                key = cache_key(self.model_name, text)
+                row = self._slots.get(key)
+                if row is None:
+                    row = self._allocate_row()
+                    self._slots[key] = row
+                    # Invalidate the row before overwriting its vector, so a
+                    # crash part-way through leaves a miss, not a wrong hit
+                    self._row_keys[row] = 0
+                    self._vectors[row] = vector
+                    self._row_keys[row] = np.frombuffer(key, dtype="uint8")
+                else:
+                    self._slots.move_to_end(key)
+                    self._vectors[row] = vector
+
+    def stats(self):
+        """
+        Returns hit/miss counters and occupancy.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._slots),
+            "capacity": self.capacity,
+        }
+
+    def flush(self):
+        """
+        Persists the vectors and the key index.
+        """
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            self._row_keys.flush()
+            keys = np.frombuffer(b"".join(self._slots.keys()), dtype="uint8").reshape(-1, self.KEY_SIZE)
+            slots = np.fromiter(self._slots.values(), dtype="int64", count=len(self._slots))
+            # Each file is replaced whole; _load discards an index left
+            # half-updated by a crash between the replacements
+            self._replace(self.KEYS_FILE, lambda f: np.save(f, keys))
+            self._replace(self.SLOTS_FILE, lambda f: np.save(f, slots))
+            meta = {"model_name": self.model_name, "dim": self.dim, "capacity": self.capacity}
+            self._replace(self.META_FILE, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    def close(self):
+        self.flush()
+        self._vectors = None
+        self._row_keys = None
+
+    def _replace(self, name, write):
+        file_path = os.path.join(self.path, name)
+        with open(file_path + ".tmp", "wb") as f:
+            write(f)
+        os.replace(file_path + ".tmp", file_path)
+
+    def _allocate_row(self):
+        if self._free_rows:
+            return self._free_rows.pop()
+        if self._next_row < self.capacity:
+            self._next_row += 1
+            return self._next_row - 1
+        _, row = self._slots.popitem(last=False)
+        return row
+
+    def _create(self, dim):
+        self.dim = dim
+        self._slots.clear()
+        self._free_rows = []
+        self._next_row = 0
+        self._vectors = np.lib.format.open_memmap(
+            os.path.join(self.path, self.VECTORS_FILE), mode="w+",
+            dtype="float32", shape=(self.capacity, dim))
+        self._row_keys = np.lib.format.open_memmap(
+            os.path.join(self.path, self.ROW_KEYS_FILE), mode="w+",
+            dtype="uint8", shape=(self.capacity, self.KEY_SIZE))
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, self.META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return  # Missing or torn: start over on the first put
+        if meta.get("capacity") != self.capacity or meta.get("model_name") != self.model_name:
+            return  # Incompatible layout: start over on the first put
+        try:
+            vectors = np.load(os.path.join(self.path, self.VECTORS_FILE), mmap_mode="r+")
+            row_keys = np.load(os.path.join(self.path, self.ROW_KEYS_FILE), mmap_mode="r+")
+        except (OSError, ValueError):
+            return  # Missing, or written before row keys were kept: start over
+        if vectors.shape != (self.capacity, meta["dim"]) or row_keys.shape != (self.capacity, self.KEY_SIZE):
+            return
+        self.dim = meta["dim"]
+        self._vectors = vectors
+        self._row_keys = row_keys
+        keys, slots = self._load_index()
+        # Keep only index entries whose row still holds that key
+        valid = (self._row_keys[slots] == keys).all(axis=1)
+        self._slots = OrderedDict(zip((key.tobytes() for key in keys[valid]), slots[valid].tolist()))
+        used = np.zeros(self.capacity, dtype="bool")
+        used[slots[valid]] = True
+        self._next_row = int(np.flatnonzero(used)[-1]) + 1 if used.any() else 0
+        self._free_rows = np.flatnonzero(~used[:self._next_row])[::-1].tolist()
+
+    def _load_index(self):
+        # A missing, torn or mismatched key index reads as empty; the vectors
+        # stay on disk and rows are reused as new entries arrive
+        empty = np.zeros((0, self.KEY_SIZE), dtype="uint8"), np.zeros(0, dtype="int64")
+        try:
+            keys = np.load(os.path.join(self.path, self.KEYS_FILE))
+            slots = np.load(os.path.join(self.path, self.SLOTS_FILE))
+        except (OSError, ValueError, EOFError):
+            return empty
+        if (keys.dtype != np.uint8 or keys.ndim != 2 or keys.shape[1] != self.KEY_SIZE or slots.ndim != 1
+                or len(keys) != len(slots) or not np.issubdtype(slots.dtype, np.integer)):
+            return empty
+        if len(slots) and (slots.min() < 0 or slots.max() >= self.capacity):
+            return empty
+        return keys, slots
@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from embedding import encode_with_cache, get_embedding_model
+
+
+def approximate_token_count(text):
+    """
+    Cheap token estimate used to sort and size batches (~4 chars per token).
+    """
+    return len(text) // 4 + 1
+
+
+class BatchEncoder:
+    """
+    Encodes chunks in length-sorted, adaptively sized batches.
+
+    Sorting by length keeps similarly sized texts together so little compute is
+    spent on padding. Each batch grows until batch_size * longest_text would
+    exceed max_tokens_per_batch. Results come back in the caller's order.
+
+    model can be any object with a SentenceTransformer-style encode(), for
+    example embedding.HashingEmbedder in tests.
+    """
+    def __init__(self, model, max_tokens_per_batch=8192, max_batch_size=128,
+                 cache=None, length_fn=approximate_token_count):
+        self.model = model
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.length_fn = length_fn
+
+    def encode(self, sentences, use_cache=True, **kwargs):
+        """
+        Encodes a list of texts and returns a float32 array in input order.
+        Accepts the same call shape as the wrapped model, so a BatchEncoder
+        can stand in wherever a model is expected.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.cache is not None and use_cache:
+            vectors = encode_with_cache(self, texts, self.cache, use_cache=False)
+        else:
+            vectors = self._encode_sorted(texts)
+        return vectors[0] if single else vectors
+
+    def iter_batches(self, texts):
+        """
+        Yields lists of positions into texts, one list per model call.
+        """
+        lengths = np.fromiter((self.length_fn(text) for text in texts), dtype="int64", count=len(texts))
+        order = np.argsort(lengths, kind="stable")
+        batch = []
+        for position in order.tolist():
+            # lengths are ascending, so the current text is the longest in the batch
+            if batch and (len(batch) >= self.max_batch_size or
+                          (len(batch) + 1) * lengths[position] > self.max_tokens_per_batch):
+                yield batch
+                batch = []
+            batch.append(position)
+        if batch:
+            yield batch
+
+    def _encode_sorted(self, texts):
+        vectors = None
+        for batch in self.iter_batches(texts):
+            encoded = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                        convert_to_numpy=True, show_progress_bar=False)
+            encoded = np.asarray(encoded, dtype="float32")
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype="float32")
+            vectors[batch] = encoded
+        if vectors is None:
+            return np.empty((0, 0), dtype="float32")
+        return vectors
+
+
+class QueryMicroBatcher:
+    """
+    Merges concurrent single-query encode calls into one model forward pass.
+
+    A background thread takes the first waiting query, then keeps collecting
+    queries for up to max_wait_ms (or until max_batch_size) before encoding
+    them together. Callers block on encode() or await the Future from submit().
+    """
+    _STOP = object()
+
+    def __init__(self, model, max_batch_size=32, max_wait_ms=2.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.queries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="query-micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """
+        Queues a query and returns a Future resolving to its vector.
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text, timeout=None):
+        """
+        Encodes a single query, sharing a forward pass with concurrent callers.
+        """
+        return self.submit(text).result(timeout)
+
+    def close(self):
+        """
+        Stops the background thread after draining queued queries.
+        """
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            vectors = self.model.encode([text for text, _ in batch], batch_size=len(batch),
+                                        convert_to_numpy=True, show_progress_bar=False)
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        for (_, future), vector in zip(batch, np.asarray(vectors, dtype="float32")):
+            future.set_result(vector)
+
+
+def load_encoder(model_name="all-MiniLM-L6-v2", cache=None, **kwargs):
+    """
+    Returns the shared embedding model wrapped in a BatchEncoder.
+    """
+    return BatchEncoder(get_embedding_model(model_name), cache=cache, **kwargs)
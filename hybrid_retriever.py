@@ -0,0 +1,176 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sparse_retriever import BM25Retriever
+from vector_store import VectorStore
+
+FUSION_METHODS = ("rrf", "weighted")
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_dense_pool():
+    """
+    Returns the process-wide thread pool that runs dense searches for
+    HybridRetriever instances not given their own executor.
+
+    It is separate from the AsyncExecutor pool on purpose: arun() calls the
+    retriever on that pool, and waiting there on work queued behind it could
+    deadlock once every worker is busy.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-dense")
+        return _shared_pool
+
+
+class DenseRetriever:
+    """
+    Adapts a VectorStore and an encoder to the (ids, scores) search interface.
+    Scores are similarities (negated L2 distances), higher is better.
+    """
+    def __init__(self, vector_store, encoder, nprobe=None, ef_search=None):
+        self.vector_store = vector_store
+        self.encoder = encoder
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query_embedding = np.asarray(self.encoder.encode([query]), dtype="float32")
+        results = self.vector_store.search_batch(query_embedding, top_k, self.nprobe, self.ef_search)
+        valid = results.ids[0] >= 0
+        return results.ids[0][valid], -results.scores[0][valid]
+
+
+class SparseRetriever:
+    """
+    Adapts a BM25Retriever to the (ids, scores) search interface.
+    """
+    def __init__(self, bm25: BM25Retriever):
+        self.bm25 = bm25
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        hits = self.bm25.search(query, top_k)
+        ids = np.fromiter((doc_id for doc_id, _ in hits), dtype="int64", count=len(hits))
+        scores = np.fromiter((score for _, score in hits), dtype="float32", count=len(hits))
+        return ids, scores
+
+
+class HybridRetriever:
+    """
+    Runs a sparse (BM25) and a dense (FAISS) search concurrently and fuses
+    their rankings.
+
+    Both sources must share one id space: id i is documents[i]. fusion="rrf"
+    uses reciprocal-rank fusion, weight / (rrf_k + rank); fusion="weighted"
+    min-max normalizes each source's scores and adds them with weights.
+    The dense search runs on a worker thread while the sparse search runs on
+    the calling thread, so latency is close to the slower of the two.
+    Instances are callable as retriever(query, documents) for ModularRAGPipeline.
+
+    Dense searches go to executor if given (the caller owns it), else to a
+    private pool of max_workers threads if set (released by close()), else to
+    shared_dense_pool().
+    """
+    def __init__(self, sparse, dense, documents: Sequence[str], sparse_k: int = 20,
+                 dense_k: int = 20, top_k: int = 5, fusion: str = "rrf", rrf_k: int = 60,
+                 weights: Tuple[float, float] = (1.0, 1.0), executor=None,
+                 max_workers: Optional[int] = None):
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"fusion must be one of {FUSION_METHODS}, got {fusion!r}")
+        self.sparse = sparse
+        self.dense = dense
+        self.documents = documents
+        self.sparse_k = sparse_k
+        self.dense_k = dense_k
+        self.top_k = top_k
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.weights = weights
+        self._owns_executor = executor is None and max_workers is not None
+        if executor is None:
+            executor = (ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hybrid-dense")
+                        if max_workers is not None else shared_dense_pool())
+        self.executor = executor
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[str], encoder, vector_store=None, **kwargs):
+        """
+        Builds aligned BM25 and vector indexes over documents. If vector_store
+        is given it must already hold documents[i] under chunk id i.
+        """
+        if vector_store is None:
+            embeddings = np.asarray(encoder.encode(list(documents)), dtype="float32")
+            vector_store = VectorStore(embeddings.shape[1])
+            vector_store.add_embeddings(embeddings, list(documents))
+        sparse = SparseRetriever(BM25Retriever(documents))
+        dense = DenseRetriever(vector_store, encoder)
+        return cls(sparse, dense, documents, **kwargs)
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Returns up to top_k fused (doc_id, score) pairs, best first.
+        """
+        top_k = self.top_k if top_k is None else top_k
+        dense_future = self.executor.submit(self.dense.search, query, self.dense_k)
+        sparse_ids, sparse_scores = self.sparse.search(query, self.sparse_k)
+        dense_ids, dense_scores = dense_future.result()
+        ids, scores = self.fuse((sparse_ids, sparse_scores), (dense_ids, dense_scores), top_k)
+        return list(zip(ids.tolist(), scores.tolist()))
+
+    def fuse(self, sparse, dense, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fuses two (ids, scores) rankings, each ordered best first.
+        """
+        contributions = []
+        for (ids, scores), weight in zip((sparse, dense), self.weights):
+            if self.fusion == "rrf":
+                contributions.append(weight / (self.rrf_k + np.arange(1, len(ids) + 1)))
+            else:
+                contributions.append(weight * _min_max(scores))
+        all_ids = np.concatenate([sparse[0], dense[0]]).astype("int64", copy=False)
+        if len(all_ids) == 0:
+            return all_ids, np.zeros(0, dtype="float64")
+        unique_ids, inverse = np.unique(all_ids, return_inverse=True)
+        fused = np.bincount(inverse, weights=np.concatenate(contributions))
+        if top_k < len(fused):
+            best = np.argpartition(-fused, top_k)[:top_k]
+        else:
+            best = np.arange(len(fused))
+        best = best[np.argsort(-fused[best], kind="stable")]
+        return unique_ids[best], fused[best]
+
+    def __call__(self, query: str, documents: Optional[Sequence[str]] = None) -> List[str]:
+        if documents is not None and documents is not self.documents:
+            raise ValueError("documents is not the list this retriever was built from")
+        return [self.documents[doc_id] for doc_id, _ in self.search(query)]
+
+    def close(self):
+        """
+        Shuts down the private pool, if this retriever created one.
+        """
+        if self._owns_executor:
+            self.executor.shutdown()
+            self._owns_executor = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _min_max(scores):
+    scores = np.asarray(scores, dtype="float64")
+    if len(scores) == 0:
+        return scores
+    span = scores.max() - scores.min()
+    if span == 0:
+        return np.ones_like(scores)
+    return (scores - scores.min()) / span
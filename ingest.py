@@ -0,0 +1,463 @@
+"""
+End-to-end ingestion: a directory of PDFs -> chunks -> embeddings -> VectorStore.
+
+Stages run concurrently and are connected by bounded queues, so no stage
+buffers more than a few batches of a corpus (or the training sample of a new
+IVF/PQ/int8 index, or, with deduplication on, one document's chunk texts):
+
+    extract (process pool, page ranges) -> chunk + dedup (thread) ->
+    embed (thread pool) -> index (single writer thread)
+
+A manifest of per-file SHA-256 hashes is saved next to the store. On rerun,
+unchanged files are skipped, changed files are re-ingested in place
+(upsert by document id) and files that disappeared are deleted.
+
+Usage:
+    python ingest.py PDF_DIR STORE_DIR [--index-type hnsw] [--extract-workers 4]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from embedding import HashingEmbedder
+from dedup import MinHashDeduplicator, group_duplicates
+from embedding_cache import EmbeddingCache
+from encoder import BatchEncoder, load_encoder
+from pdf_loader import count_pdf_pages, extract_page_range, extract_pool
+from text_splitter import iter_chunks
+from vector_store import CODECS, INDEX_TYPES, MANIFEST_FILE as STORE_MANIFEST_FILE, VectorStore
+
+MANIFEST_FILE = "ingest_manifest.json"
+_DONE = object()
+
+
+class IngestStats:
+    """
+    Thread-safe progress counters with throughput reporting.
+    """
+    def __init__(self):
+        self.files = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.pages = 0
+        self.chunks = 0
+        self.duplicates = 0
+        self.indexed = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "files": self.files,
+            "skipped": self.skipped,
+            "deleted": self.deleted,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "duplicates": self.duplicates,
+            "indexed": self.indexed,
+            "seconds": elapsed,
+            "pages_per_s": self.pages / elapsed,
+            "chunks_per_s": self.chunks / elapsed,
+        }
+
+    def format(self):
+        s = self.snapshot()
+        return (f"{s['files']} files ({s['skipped']} unchanged), {s['pages']} pages, "
+                f"{s['chunks']} chunks ({s['duplicates']} duplicates merged), "
+                f"{s['indexed']} indexed in {s['seconds']:.1f}s "
+                f"[{s['pages_per_s']:.1f} pages/s, {s['chunks_per_s']:.1f} chunks/s]")
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(store_path):
+    path = os.path.join(store_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(store_path, manifest):
+    path = os.path.join(store_path, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+class IngestPipeline:
+    """
+    Pipelined extract -> chunk -> embed -> index over many PDFs.
+
+    encoder is anything with encode(list_of_texts), typically an
+    encoder.BatchEncoder. If dedup_threshold is set, exact and near
+    duplicate chunks of a document (repeated headers, footers, disclaimers)
+    are merged before embedding: only the first is indexed, and its metadata
+    lists every page it appeared on ("pages") and the merged chunks' spans
+    ("duplicates"). Boilerplate can repeat anywhere in a document, so this
+    holds the text of every chunk of the document being chunked; it is off
+    by default to keep memory independent of document size.
+
+    index_type and any other keyword arguments (codec, rerank_factor, nlist,
+    train_size, ...) configure a new VectorStore. Indexes that need training
+    (IVF, PQ, int8) are trained on the first VectorStore.training_sizes()
+    recommended vectors of the run, held back until that many have been
+    embedded, rather than on whichever batch arrives first.
+    """
+    def __init__(self, encoder, store_path, index_type="flat", chunk_size=500, overlap=50,
+                 boundary="char", extract_workers=None, embed_workers=2, pages_per_task=16,
+                 chunk_batch=256, queue_size=8, checkpoint_every=50, progress=print,
+                 progress_interval=5.0, dedup_threshold=None, **index_params):
+        self.encoder = encoder
+        self.store_path = store_path
+        self.index_type = index_type
+        self.index_params = index_params
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.boundary = boundary
+        self.deduplicator = MinHashDeduplicator(dedup_threshold) if dedup_threshold is not None else None
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.embed_workers = embed_workers
+        self.pages_per_task = pages_per_task
+        self.chunk_batch = chunk_batch
+        self.queue_size = queue_size
+        self.checkpoint_every = checkpoint_every
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.store = None
+        self.stats = None
+
+    def run(self, pdf_dir):
+        """
+        Ingests every *.pdf under pdf_dir and returns the final stats snapshot.
+        """
+        self.stats = IngestStats()
+        self._abort = threading.Event()
+        self._errors = []
+        manifest = load_manifest(self.store_path)
+        self.store = self._open_store()
+
+        files = sorted(os.path.relpath(os.path.join(root, name), pdf_dir)
+                       for root, _, names in os.walk(pdf_dir)
+                       for name in names if name.lower().endswith(".pdf"))
+        todo = []
+        for rel_path in files:
+            sha = file_sha256(os.path.join(pdf_dir, rel_path))
+            if manifest.get(rel_path) == sha:
+                self.stats.add(files=1, skipped=1)
+            else:
+                todo.append((rel_path, os.path.join(pdf_dir, rel_path), sha))
+        for rel_path in set(manifest) - set(files):
+            if self.store is not None:
+                self.store.delete_document(rel_path)
+            del manifest[rel_path]
+            self.stats.add(deleted=1)
+
+        pages_q = queue.Queue(self.queue_size)
+        chunks_q = queue.Queue(self.queue_size)
+        vectors_q = queue.Queue(self.queue_size)
+        threads = [
+            threading.Thread(target=self._guard, args=(self._extract, todo, pages_q), name="ingest-extract"),
+            threading.Thread(target=self._guard, args=(self._chunk, pages_q, chunks_q), name="ingest-chunk"),
+            threading.Thread(target=self._guard, args=(self._embed, chunks_q, vectors_q), name="ingest-embed"),
+        ]
+        for thread in threads:
+            thread.start()
+        # The index stage runs on this thread: it is the only writer of the store
+        self._guard(self._index, vectors_q, manifest)
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        if self.store is not None:
+            self.store.save(self.store_path)
+        save_manifest(self.store_path, manifest)
+        self.progress(self.stats.format())
+        return self.stats.snapshot()
+
+    # -------------------------------
+    # Stages
+    # -------------------------------
+    def _extract(self, todo, pages_q):
+        """
+        Fans (file, page range) tasks out to a process pool, keeping a bounded
+        window in flight, and emits pages in file and page order.
+        """
+        def tasks():
+            for rel_path, path, sha in todo:
+                page_count = count_pdf_pages(path)
+                yield ("start", rel_path, sha), None
+                for start in range(0, page_count, self.pages_per_task):
+                    yield None, (path, start, min(start + self.pages_per_task, page_count))
+                yield ("end", rel_path, sha), None
+
+        with extract_pool(self.extract_workers) as pool:
+            pending = deque()
+            for marker, page_range in tasks():
+                pending.append(marker if page_range is None else pool.submit(extract_page_range, *page_range))
+                while len(pending) > self.extract_workers * 2 or (pending and isinstance(pending[0], tuple)):
+                    self._emit_extracted(pending.popleft(), pages_q)
+            while pending:
+                self._emit_extracted(pending.popleft(), pages_q)
+        self._put(pages_q, _DONE)
+
+    def _emit_extracted(self, item, pages_q):
+        if isinstance(item, tuple):
+            self._put(pages_q, item)
+            return
+        pages = item.result()
+        self.stats.add(pages=len(pages))
+        self._put(pages_q, ("pages", pages))
+
+    def _chunk(self, pages_q, chunks_q):
+        while True:
+            item = self._get(pages_q)
+            if item is _DONE:
+                break
+            _, doc_id, sha = item  # "start" marker
+            batches = 0
+            batch = []
+            chunks = iter_chunks(self._doc_pages(pages_q), doc_id=doc_id, chunk_size=self.chunk_size,
+                                 overlap=self.overlap, boundary=self.boundary)
+            if self.deduplicator is not None:
+                # Boilerplate can repeat anywhere in a document, so all of its
+                # chunks are grouped before the first batch is emitted; detached
+                # chunks keep their own text but not the pages behind them
+                groups = group_duplicates([chunk.detach() for chunk in chunks], self.deduplicator)
+                self.stats.add(duplicates=sum(len(duplicates) for _, duplicates in groups))
+            else:
+                groups = ((chunk, ()) for chunk in chunks)
+            for group in groups:
+                batch.append(group)
+                if len(batch) >= self.chunk_batch:
+                    self._put(chunks_q, ("chunks", doc_id, batch))
+                    batches += 1
+                    batch = []
+            if batch:
+                self._put(chunks_q, ("chunks", doc_id, batch))
+                batches += 1
+            self._put(chunks_q, ("end", doc_id, sha, batches))
+        self._put(chunks_q, _DONE)
+
+    def _doc_pages(self, pages_q):
+        while True:
+            item = self._get(pages_q)
+            if item[0] == "end":
+                return
+            yield from item[1]
+
+    def _embed(self, chunks_q, vectors_q):
+        def encode(doc_id, batch):
+            texts = [chunk.text for chunk, _ in batch]
+            metadatas = [self._chunk_metadata(chunk, duplicates) for chunk, duplicates in batch]
+            vectors = self.encoder.encode(texts)
+            self.stats.add(chunks=len(texts))
+            self._put(vectors_q, ("vectors", doc_id, vectors, texts, metadatas))
+
+        with ThreadPoolExecutor(max_workers=self.embed_workers) as pool:
+            in_flight = deque()
+            while True:
+                item = self._get(chunks_q)
+                if item is _DONE:
+                    break
+                if item[0] == "chunks":
+                    in_flight.append(pool.submit(encode, item[1], item[2]))
+                    while len(in_flight) > self.embed_workers:
+                        in_flight.popleft().result()
+                else:
+                    self._put(vectors_q, item)  # "end" may overtake in-flight batches
+            for future in in_flight:
+                future.result()
+        self._put(vectors_q, _DONE)
+
+    def _index(self, vectors_q, manifest):
+        received = {}  # doc_id -> batches indexed so far
+        expected = {}  # doc_id -> (sha, total batches) once the chunker is done
+        untrained = []  # "vectors" items held back until the index is trained
+        completed = 0
+        last_report = time.perf_counter()
+
+        def add(item):
+            _, doc_id, vectors, texts, metadatas = item
+            if doc_id not in received:
+                self.store.delete_document(doc_id)
+                received[doc_id] = 0
+            self.store.add_embeddings(vectors, texts, metadatas, doc_id=doc_id)
+            received[doc_id] += 1
+            self.stats.add(indexed=len(texts))
+            check_complete(doc_id)
+
+        def check_complete(doc_id):
+            nonlocal completed
+            if doc_id in expected and received.get(doc_id, 0) == expected[doc_id][1]:
+                manifest[doc_id] = expected.pop(doc_id)[0]
+                received.pop(doc_id, None)
+                self.stats.add(files=1)
+                completed += 1
+                if self.checkpoint_every and completed % self.checkpoint_every == 0 and self.store is not None:
+                    self.store.save(self.store_path)
+                    save_manifest(self.store_path, manifest)
+
+        while True:
+            item = self._get(vectors_q)
+            if item is _DONE:
+                break
+            doc_id = item[1]
+            if item[0] == "vectors":
+                if self.store is None:
+                    self.store = self._new_store(len(item[2][0]))
+                if untrained or not self.store.index.is_trained:
+                    untrained.append(item)
+                    if sum(len(held[3]) for held in untrained) >= self.store.training_sizes()[1]:
+                        self._train(untrained)
+                        for held in untrained:
+                            add(held)
+                        untrained = []
+                else:
+                    add(item)
+            else:
+                _, _, sha, batches = item
+                expected[doc_id] = (sha, batches)
+                if batches == 0 and self.store is not None:
+                    self.store.delete_document(doc_id)
+                check_complete(doc_id)
+            if self.progress and time.perf_counter() - last_report >= self.progress_interval:
+                self.progress(self.stats.format())
+                last_report = time.perf_counter()
+        if untrained:
+            # The corpus is smaller than the recommended training sample
+            self._train(untrained)
+            for held in untrained:
+                add(held)
+
+    def _train(self, items):
+        vectors = np.concatenate([np.asarray(item[2], dtype="float32") for item in items])
+        minimum, _ = self.store.training_sizes()
+        if len(vectors) < minimum:
+            raise ValueError(f"{len(vectors)} chunks are too few to train the {self.index_type} index, which "
+                             f"needs at least {minimum}; lower nlist / pq_nbits or use index_type='flat'")
+        self.store.train(vectors)
+
+    # -------------------------------
+    # Helpers
+    # -------------------------------
+    def _chunk_metadata(self, chunk, duplicates=()):
+        metadata = {"source": chunk.doc_id, "page": chunk.page, "start": chunk.start, "end": chunk.end}
+        if duplicates:
+            # Provenance of the chunks merged into this one
+            metadata["pages"] = sorted({chunk.page, *(duplicate.page for duplicate in duplicates)})
+            metadata["duplicates"] = [[duplicate.page, duplicate.start, duplicate.end] for duplicate in duplicates]
+        return metadata
+
+    def _open_store(self):
+        if os.path.exists(os.path.join(self.store_path, STORE_MANIFEST_FILE)):
+            return VectorStore.load(self.store_path, mmap=False)
+        return None
+
+    def _new_store(self, embedding_dim):
+        return VectorStore(embedding_dim, index_type=self.index_type, **self.index_params)
+
+    def _guard(self, stage, *args):
+        try:
+            stage(*args)
+        except BaseException as exc:
+            self._errors.append(exc)
+            self._abort.set()
+
+    def _put(self, q, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("ingestion aborted")
+
+    def _get(self, q):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise RuntimeError("ingestion aborted")
+
+
+def ingest_directory(pdf_dir, store_path, encoder=None, model_name="all-MiniLM-L6-v2",
+                     cache_dir=None, **kwargs):
+    """
+    Ingests a directory of PDFs into the VectorStore at store_path.
+    Returns the final stats snapshot.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    if encoder is None:
+        cache = EmbeddingCache(cache_dir, model_name) if cache_dir else None
+        encoder = load_encoder(model_name, cache=cache)
+    try:
+        return IngestPipeline(encoder, store_path, **kwargs).run(pdf_dir)
+    finally:
+        cache = getattr(encoder, "cache", None)
+        if cache is not None:
+            cache.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDFs into a vector store.")
+    parser.add_argument("pdf_dir")
+    parser.add_argument("store_dir")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--cache-dir", help="persistent embedding cache directory")
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--codec", default="float32", choices=CODECS,
+                        help="how the index stores vectors (float16/int8/pq compress them)")
+    parser.add_argument("--nlist", type=int, default=None,
+                        help="IVF clusters (ivf_* index types); about sqrt(chunks) is a good start")
+    parser.add_argument("--rerank-factor", type=int, default=0,
+                        help="keep full-precision vectors and re-rank top_k * N candidates exactly")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--boundary", default="char", choices=("char", "token", "sentence"))
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help="merge chunks of a document at this estimated Jaccard similarity "
+                             "(e.g. 0.8); holds each document's chunk texts in memory")
+    parser.add_argument("--extract-workers", type=int, default=None)
+    parser.add_argument("--embed-workers", type=int, default=2)
+    parser.add_argument("--hashing-embedder", action="store_true",
+                        help="use the offline deterministic stand-in embedder")
+    args = parser.parse_args(argv)
+
+    encoder = None
+    if args.hashing_embedder:
+        encoder = BatchEncoder(HashingEmbedder())
+    index_params = {"nlist": args.nlist} if args.nlist is not None else {}
+    ingest_directory(args.pdf_dir, args.store_dir, encoder=encoder, model_name=args.model,
+                     cache_dir=args.cache_dir, index_type=args.index_type, codec=args.codec,
+                     rerank_factor=args.rerank_factor, chunk_size=args.chunk_size,
+                     dedup_threshold=args.dedup_threshold,
+                     overlap=args.overlap, boundary=args.boundary,
+                     extract_workers=args.extract_workers, embed_workers=args.embed_workers, **index_params)
+
+
+if __name__ == "__main__":
+    main()
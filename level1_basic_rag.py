@@ -4,6 +4,8 @@
 # Import necessary libraries
 from typing import List
 
+from sparse_retriever import BM25Retriever
+
 # Simulated document store (in a real-world scenario, this could be a vector database or search engine)
 DOCUMENTS = [
     "Retrieval-Augmented Generation (RAG) combines information retrieval with natural language generation.",
@@ -12,15 +14,9 @@ DOCUMENTS = [
     "Applications of RAG include question answering, chatbots, and document summarization."
 ]
 
-# Function to simulate document retrieval based on keyword matching
-def retrieve_documents(query: str, documents: List[str]) -> List[str]:
-    """
-    Retrieve documents that contain any keyword from the query.
-    This is a simple keyword-based retrieval for demonstration purposes.
-    """
-    keywords = query.lower().split()  # Split the query into lowercase keywords
-    retrieved = [doc for doc in documents if any(keyword in doc.lower() for keyword in keywords)]
-    return retrieved
+# Keyword retrieval: a BM25 inverted index built once at startup.
+# retrieve_documents(query, documents) returns the best-ranked matching documents.
+retrieve_documents = BM25Retriever(DOCUMENTS)
 
 # Function to simulate a language model generating an answer from retrieved documents
 def generate_answer(query: str, retrieved_docs: List[str]) -> str:
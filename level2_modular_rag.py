@@ -4,6 +4,10 @@
 
 from typing import List
 
+from async_executor import default_executor
+from sparse_retriever import BM25Retriever
+from tracing import get_tracer
+
 # -------------------------------
 # Simulated Document Store
 # -------------------------------
@@ -18,15 +22,10 @@ DOCUMENTS = [
 # -------------------------------
 # Retriever Module
 # -------------------------------
-def keyword_retriever(query: str, documents: List[str]) -> List[str]:
-    """
-    A simple keyword-based retriever.
-    It returns documents that contain any of the keywords from the query.
-    This simulates how a retriever might work in a real RAG system.
-    """
-    keywords = query.lower().split()  # Break query into lowercase keywords
-    retrieved_docs = [doc for doc in documents if any(keyword in doc.lower() for keyword in keywords)]
-    return retrieved_docs
+# A BM25 keyword retriever over an inverted index, built once at startup.
+# It is called as keyword_retriever(query, documents) and returns ranked documents;
+# per-query cost depends on the postings of the query terms, not on corpus size.
+keyword_retriever = BM25Retriever(DOCUMENTS)
 
 # -------------------------------
 # Generator Module
@@ -47,10 +46,16 @@ class ModularRAGPipeline:
     """
     A modular RAG pipeline that separates retrieval and generation logic.
     This design allows for easy swapping of components (retrievers, generators).
+    Any callable retriever(query, documents) works, e.g. keyword_retriever or a
+    hybrid_retriever.HybridRetriever that fuses BM25 and FAISS results.
+    Each stage is timed as a span (modular.retrieve, modular.generate) on the
+    tracer, or on tracing.get_tracer() if none is given.
     """
-    def __init__(self, retriever, generator):
+    def __init__(self, retriever, generator, cache=None, tracer=None):
         self.retriever = retriever  # Assign retriever function
         self.generator = generator  # Assign generator function
+        self.cache = cache          # Optional answer_cache.AnswerCache
+        self.tracer = tracer        # Optional tracing.Tracer
 
     def run(self, query: str) -> str:
         """
@@ -58,9 +63,40 @@ class ModularRAGPipeline:
         1. Retrieve relevant documents using the retriever.
         2. Generate a response using the generator.
         """
-        retrieved = self.retriever(query, DOCUMENTS)  # Step 1: Retrieve documents
-        response = self.generator(query, retrieved)   # Step 2: Generate response
-        return response
+        tracer = self.tracer or get_tracer()
+        with tracer.span("modular.run"):
+            if self.cache is not None:
+                cached, miss = self.cache.lookup(query)
+                if cached is not None:
+                    return cached
+            with tracer.span("modular.retrieve"):
+                retrieved = self.retriever(query, DOCUMENTS)  # Step 1: Retrieve documents
+            tracer.count("modular.documents_returned", len(retrieved))
+            with tracer.span("modular.generate"):
+                response = self.generator(query, retrieved)   # Step 2: Generate response
+            if self.cache is not None:
+                self.cache.put(query, response, miss=miss)
+            return response
+
+    async def arun(self, query: str, executor=None) -> str:
+        """
+        Async variant of run(). Retrieval and generation run on the executor's
+        worker pool so the event loop stays free, and the request waits for
+        one of the executor's in-flight slots first.
+        """
+        executor = executor or default_executor()
+        tracer = self.tracer or get_tracer()
+
+        async def compute():
+            with tracer.span("modular.retrieve"):
+                retrieved = await executor.run(self.retriever, query, DOCUMENTS)
+            tracer.count("modular.documents_returned", len(retrieved))
+            with tracer.span("modular.generate"):
+                return await executor.run(self.generator, query, retrieved)
+
+        with tracer.span("modular.run"):
+            async with executor.admit():
+                return await executor.cached(self.cache, query, None, compute)
 
 # -------------------------------
 # Example Usage
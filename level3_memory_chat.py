@@ -1,11 +1,11 @@
-from langchain.chains import ConversationalRetrievalChain
 from langchain.vectorstores import FAISS
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.llms import OpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.document_loaders import TextLoader
 from langchain.text_splitter import CharacterTextSplitter
 
+from conversation_memory import ContextAssembler, ConversationMemory
+
 # Step 1: Load and split documents
 loader = TextLoader("file:///C:/Users/VKUMAR86/Downloads/Explainx.ai_RAG.pdf")  # Replace with your actual document path
 documents = loader.load()
@@ -16,16 +16,22 @@ docs = text_splitter.split_documents(documents)
 embeddings = OpenAIEmbeddings()
 vectorstore = FAISS.from_documents(docs, embeddings)
 
-# Step 3: Initialize conversational memory
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+# Step 3: Initialize bounded conversational memory
+# Recent turns are kept verbatim up to a token budget and older turns are folded
+# into a short rolling summary, so the prompt does not grow with the session.
+memory = ConversationMemory(window_tokens=1024, summary_tokens=256)
+assembler = ContextAssembler(memory, max_tokens=3000)
 
-# Step 4: Create conversational retrieval chain
+# Step 4: Answer from a prompt that fits the token budget
 llm = OpenAI(temperature=0)
-qa_chain = ConversationalRetrievalChain.from_llm(
-    llm=llm,
-    retriever=vectorstore.as_retriever(),
-    memory=memory
-)
+
+def ask(question, k=8):
+    # Scores are L2 distances (lower is closer); negate so higher is better
+    hits = vectorstore.similarity_search_with_score(question, k=k)
+    prompt = assembler.build(question, [(doc.page_content, -score) for doc, score in hits])
+    answer = llm(prompt)
+    memory.add_turn(question, answer)
+    return answer
 
 # Step 5: Simulate a conversation
 questions = [
@@ -35,6 +41,6 @@ questions = [
 ]
 
 for question in questions:
-    result = qa_chain.run(question)
+    result = ask(question)
     print(f"Q: {question}")
     print(f"A: {result}\n")
\ No newline at end of file
@@ -8,6 +8,10 @@ The retriever filters documents based on both keyword relevance and metadata con
 
 from typing import List, Dict, Any
 
+from async_executor import default_executor
+from metadata_index import MetadataIndex
+from tracing import get_tracer
+
 # -------------------------------
 # Simulated Document Store with Metadata
 # -------------------------------
@@ -67,6 +71,80 @@ def metadata_filtering_retriever(query: str, documents: List[Dict[str, Any]], me
 
     return filtered_docs
 
+# -------------------------------
+# Indexed Metadata Retriever
+# -------------------------------
+class IndexedMetadataRetriever:
+    """
+    Metadata-aware retriever backed by a MetadataIndex built once at startup.
+
+    The metadata filter is compiled into a candidate id set from posting lists
+    and sorted date columns instead of checking every document. If a
+    VectorStore and encoder are given, the index is built from the metadata
+    stored with each chunk, so candidates are chunk ids, and it is pushed into
+    the FAISS search as a pre-filter; the index is rebuilt whenever the store
+    changes. Otherwise ids are positions in documents and keywords are
+    matched against the candidates only. Either way, more selective filters
+    mean less work.
+
+    Filters support equality ({"topic": "RAG"}), IN ({"source": ["Blog", "Arxiv"]})
+    and date ranges ({"date": {"gte": "2023-01-01", "lt": "2023-04-01"}}).
+    Filtering is traced as the metadata.filter span with the candidate count.
+    """
+    def __init__(self, documents: List[Dict[str, Any]], vector_store=None, encoder=None, top_k: int = 5,
+                 tracer=None):
+        self.documents = documents
+        self.vector_store = vector_store
+        self.encoder = encoder
+        self.top_k = top_k
+        self.tracer = tracer
+        self._index_version = None
+        if vector_store is None:
+            self.index = MetadataIndex()
+            for doc_id, doc in enumerate(documents):
+                self.index.add(doc_id, doc["metadata"])
+        else:
+            self._refresh_index()
+
+    def _refresh_index(self):
+        # Chunk ids change with every add, delete or upsert in the store
+        if self._index_version != self.vector_store.version:
+            self.index = MetadataIndex.from_vector_store(self.vector_store)
+            self._index_version = self.vector_store.version
+
+    def __call__(self, query: str, documents: List[Dict[str, Any]], metadata_filter: Dict[str, Any]) -> List[str]:
+        """
+        Same signature as metadata_filtering_retriever. Without a vector
+        store, documents must be the list the retriever was built from; with
+        one, it is ignored.
+
+        Parameters:
+            query (str): The user query.
+            documents (List[Dict]): The indexed documents.
+            metadata_filter (Dict[str, Any]): Metadata constraints.
+
+        Returns:
+            List[str]: Contents of the matching documents.
+        """
+        tracer = self.tracer or get_tracer()
+        with tracer.span("metadata.filter") as span:
+            if self.vector_store is not None:
+                self._refresh_index()
+            candidates = self.index.compile(metadata_filter)
+            total = len(documents) if self.vector_store is None else len(self.vector_store)
+            span.set("candidates", total if candidates is None else len(candidates))
+
+        if self.vector_store is not None:
+            query_embedding = self.encoder.encode(query)
+            return self.vector_store.search(query_embedding, self.top_k, id_filter=candidates)
+
+        if candidates is None:
+            candidates = range(len(documents))
+        tracer.count("metadata.candidates_scanned", len(candidates))
+        keywords = query.lower().split()
+        return [documents[i]["content"] for i in candidates
+                if any(keyword in documents[i]["content"].lower() for keyword in keywords)]
+
 # -------------------------------
 # Simple Generator
 # -------------------------------
@@ -91,10 +169,13 @@ def simple_generator(query: str, context_docs: List[str]) -> str:
 class MetadataRAGPipeline:
     """
     A RAG pipeline that supports metadata filtering during retrieval.
+    Stages are timed as spans (metadata.retrieve, metadata.generate).
     """
-    def __init__(self, retriever, generator):
+    def __init__(self, retriever, generator, cache=None, tracer=None):
         self.retriever = retriever
         self.generator = generator
+        self.cache = cache  # Optional answer_cache.AnswerCache
+        self.tracer = tracer  # Optional tracing.Tracer
 
     def run(self, query: str, metadata_filter: Dict[str, str]) -> str:
         """
@@ -107,8 +188,46 @@ class MetadataRAGPipeline:
         Returns:
             str: Generated response.
         """
-        retrieved_docs = self.retriever(query, DOCUMENTS_WITH_METADATA, metadata_filter)
-        return self.generator(query, retrieved_docs)
+        tracer = self.tracer or get_tracer()
+        with tracer.span("metadata.run"):
+            if self.cache is not None:
+                cached, miss = self.cache.lookup(query, metadata_filter)
+                if cached is not None:
+                    return cached
+            with tracer.span("metadata.retrieve"):
+                retrieved_docs = self.retriever(query, DOCUMENTS_WITH_METADATA, metadata_filter)
+            tracer.count("metadata.documents_returned", len(retrieved_docs))
+            with tracer.span("metadata.generate"):
+                response = self.generator(query, retrieved_docs)
+            if self.cache is not None:
+                self.cache.put(query, response, metadata_filter, miss)
+            return response
+
+    async def arun(self, query: str, metadata_filter: Dict[str, str], executor=None) -> str:
+        """
+        Async variant of run(); blocking stages run on the executor's pool.
+
+        Parameters:
+            query (str): The user query.
+            metadata_filter (Dict[str, str]): Metadata constraints.
+            executor (AsyncExecutor): Defaults to the shared executor.
+
+        Returns:
+            str: Generated response.
+        """
+        executor = executor or default_executor()
+        tracer = self.tracer or get_tracer()
+
+        async def compute():
+            with tracer.span("metadata.retrieve"):
+                retrieved_docs = await executor.run(self.retriever, query, DOCUMENTS_WITH_METADATA, metadata_filter)
+            tracer.count("metadata.documents_returned", len(retrieved_docs))
+            with tracer.span("metadata.generate"):
+                return await executor.run(self.generator, query, retrieved_docs)
+
+        with tracer.span("metadata.run"):
+            async with executor.admit():
+                return await executor.cached(self.cache, query, metadata_filter, compute)
 
 # -------------------------------
 # Example Usage
@@ -116,7 +235,7 @@ class MetadataRAGPipeline:
 if __name__ == "__main__":
     # Instantiate the pipeline
     pipeline = MetadataRAGPipeline(
-        retriever=metadata_filtering_retriever,
+        retriever=IndexedMetadataRetriever(DOCUMENTS_WITH_METADATA),
         generator=simple_generator
     )
 
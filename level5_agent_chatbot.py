@@ -4,8 +4,13 @@ An agent orchestrates multiple tools (retriever, generator, summarizer) to answe
 The agent decides which tools to invoke based on the query type.
 """
 
+import asyncio
 from typing import List, Dict, Any
 
+from async_executor import default_executor
+from sparse_retriever import BM25Retriever
+from tracing import get_tracer
+
 # -------------------------------
 # Simulated Document Store
 # -------------------------------
@@ -20,12 +25,9 @@ DOCUMENTS = [
 # -------------------------------
 # Tool: Retriever
 # -------------------------------
-def keyword_retriever(query: str, documents: List[str]) -> List[str]:
-    """
-    Retrieves documents that contain any keyword from the query.
-    """
-    keywords = query.lower().split()
-    return [doc for doc in documents if any(keyword in doc.lower() for keyword in keywords)]
+# BM25 inverted index over DOCUMENTS, built once at startup.
+# Called as keyword_retriever(query, documents); returns ranked documents.
+keyword_retriever = BM25Retriever(DOCUMENTS)
 
 # -------------------------------
 # Tool: Generator
@@ -53,14 +55,23 @@ def simple_summarizer(text: str) -> str:
 class RAGAgent:
     """
     Agent that decides which tools to invoke based on the query.
+    Tool selection, retrieval and the response step are timed as spans
+    (agent.decide_tools, agent.retrieve, agent.respond).
     """
-    def __init__(self, documents: List[str]):
+    def __init__(self, documents: List[str], cache=None, tracer=None):
         self.documents = documents
+        self.retriever = BM25Retriever(documents)  # Indexed once per agent
+        self.cache = cache  # Optional answer_cache.AnswerCache
+        self.tracer = tracer  # Optional tracing.Tracer
 
     def decide_tools(self, query: str) -> Dict[str, Any]:
         """
         Determines which tools to use based on keywords in the query.
         """
+        with (self.tracer or get_tracer()).span("agent.decide_tools"):
+            return self._decide_tools(query)
+
+    def _decide_tools(self, query: str) -> Dict[str, Any]:
         query_lower = query.lower()
         use_summary = "summarize" in query_lower or "brief" in query_lower
         use_retrieval = True  # Always retrieve documents
@@ -76,21 +87,67 @@ class RAGAgent:
         """
         Executes the agent-based RAG pipeline.
         """
-        decision = self.decide_tools(query)
+        tracer = self.tracer or get_tracer()
+        with tracer.span("agent.run"):
+            if self.cache is not None:
+                cached, miss = self.cache.lookup(query)
+                if cached is not None:
+                    return cached
+
+            decision = self.decide_tools(query)
+
+            # Step 1: Retrieve documents
+            retrieved_docs = self._retrieve(query) if decision["use_retrieval"] else []
+
+            # Step 2: Generate or summarize response
+            response = self._respond(query, decision, retrieved_docs)
+
+            if self.cache is not None:
+                self.cache.put(query, response, miss=miss)
+            return response
 
-        # Step 1: Retrieve documents
-        retrieved_docs = keyword_retriever(query, self.documents) if decision["use_retrieval"] else []
+    def _retrieve(self, query: str) -> List[str]:
+        tracer = self.tracer or get_tracer()
+        with tracer.span("agent.retrieve"):
+            retrieved_docs = self.retriever(query)
+        tracer.count("agent.documents_returned", len(retrieved_docs))
+        return retrieved_docs
 
-        # Step 2: Generate or summarize response
+    def _respond(self, query: str, decision: Dict[str, Any], retrieved_docs: List[str]) -> str:
+        """
+        Generates or summarizes a response from the retrieved documents.
+        """
+        with (self.tracer or get_tracer()).span("agent.respond"):
+            return self._compose(query, decision, retrieved_docs)
+
+    def _compose(self, query: str, decision: Dict[str, Any], retrieved_docs: List[str]) -> str:
+        if not decision["use_retrieval"]:
+            retrieved_docs = []
         if decision["use_generation"]:
-            response = simple_generator(query, retrieved_docs)
-        elif decision["use_summary"]:
+            return simple_generator(query, retrieved_docs)
+        if decision["use_summary"]:
             full_text = " ".join(retrieved_docs)
-            response = simple_summarizer(full_text)
-        else:
-            response = "No tools selected to answer the query."
+            return simple_summarizer(full_text)
+        return "No tools selected to answer the query."
+
+    async def arun(self, query: str, executor=None) -> str:
+        """
+        Async variant of run(). Tool selection and retrieval do not depend on
+        each other, so they run concurrently on the executor's pool.
+        """
+        executor = executor or default_executor()
+
+        async def compute():
+            # Retrieval is always enabled, so it can start before the decision is known
+            decision, retrieved_docs = await asyncio.gather(
+                executor.run(self.decide_tools, query),
+                executor.run(self._retrieve, query),
+            )
+            return await executor.run(self._respond, query, decision, retrieved_docs)
 
-        return response
+        with (self.tracer or get_tracer()).span("agent.run"):
+            async with executor.admit():
+                return await executor.cached(self.cache, query, None, compute)
 
 # -------------------------------
 # Example Usage
@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+import numpy as np
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+
+class MetadataIndex:
+    """
+    Secondary index over chunk metadata for pre-filtering vector search.
+
+    Every field/value pair has a posting list of ids. Fields listed in
+    range_fields (ISO dates by default) also get a sorted column so range
+    predicates are two binary searches.
+
+    A filter is a dict of field -> predicate:
+        "RAG"                               equality
+        ["Blog", "Arxiv"]                   IN (any of the values)
+        {"gte": "2023-01-01", "lt": "2024"} range, for range fields only
+    compile() turns a filter into a sorted array of matching ids.
+    """
+    def __init__(self, range_fields=("date",)):
+        self.range_fields = tuple(range_fields)
+        self._pending = defaultdict(list)  # (field, value) -> ids not yet merged
+        self._postings = {}  # (field, value) -> sorted int64 array
+        self._range_pending = {field: [] for field in self.range_fields}
+        self._range_columns = {}  # field -> (sorted values, ids in the same order)
+        self._removed = set()
+
+    def add(self, chunk_id, metadata):
+        """
+        Indexes the metadata of one chunk.
+        """
+        for field, value in (metadata or {}).items():
+            if isinstance(value, (list, dict)):
+                continue
+            self._pending[(field, value)].append(chunk_id)
+            if field in self._range_pending:
+                self._range_pending[field].append((value, chunk_id))
+        self._removed.discard(chunk_id)
+
+    def add_many(self, chunk_ids, metadatas):
+        for chunk_id, metadata in zip(chunk_ids, metadatas):
+            self.add(int(chunk_id), metadata)
+
+    def remove(self, chunk_ids):
+        """
+        Excludes chunks from all future results (e.g. after a delete).
+        """
+        self._removed.update(int(chunk_id) for chunk_id in chunk_ids)
+
+    @classmethod
+    def from_vector_store(cls, store, range_fields=("date",)):
+        """
+        Builds an index over the metadata of every live chunk in a VectorStore.
+        """
+        index = cls(range_fields)
+        for chunk_id, metadata in store.iter_metadata():
+            index.add(chunk_id, metadata)
+        return index
+
+    def values(self, field):
+        """
+        Returns the sorted distinct values indexed for a field.
+        """
+        self._merge_pending()
+        return sorted({value for f, value in self._postings if f == field}, key=str)
+
+    def compile(self, metadata_filter):
+        """
+        Returns a sorted int64 array of ids matching every predicate, or None
+        when the filter is empty (no restriction).
+        """
+        if not metadata_filter:
+            return None
+        self._merge_pending()
+        candidate_sets = sorted((self._match(field, predicate)
+                                 for field, predicate in metadata_filter.items()), key=len)
+        result = candidate_sets[0]
+        for ids in candidate_sets[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, ids, assume_unique=True)
+        if self._removed and len(result):
+            result = result[~np.isin(result, np.fromiter(self._removed, dtype="int64"))]
+        return result
+
+    def _match(self, field, predicate):
+        if isinstance(predicate, dict):
+            return self._match_range(field, predicate)
+        if isinstance(predicate, (list, tuple, set, frozenset)):
+            postings = [self._postings.get((field, value)) for value in predicate]
+            postings = [ids for ids in postings if ids is not None]
+            if not postings:
+                return np.zeros(0, dtype="int64")
+            return np.unique(np.concatenate(postings))
+        return self._postings.get((field, predicate), np.zeros(0, dtype="int64"))
+
+    def _match_range(self, field, predicate):
+        if field not in self.range_fields:
+            raise ValueError(f"range predicates need {field!r} in range_fields {self.range_fields}")
+        unknown = set(predicate) - set(RANGE_OPERATORS)
+        if unknown:
+            raise ValueError(f"unknown range operators {sorted(unknown)}; use {RANGE_OPERATORS}")
+        if field not in self._range_columns:
+            return np.zeros(0, dtype="int64")
+        values, ids = self._range_columns[field]
+        lo, hi = 0, len(values)
+        if "gte" in predicate:
+            lo = max(lo, np.searchsorted(values, predicate["gte"], side="left"))
+        if "gt" in predicate:
+            lo = max(lo, np.searchsorted(values, predicate["gt"], side="right"))
+        if "lte" in predicate:
+            hi = min(hi, np.searchsorted(values, predicate["lte"], side="right"))
+        if "lt" in predicate:
+            hi = min(hi, np.searchsorted(values, predicate["lt"], side="left"))
+        return np.sort(ids[lo:hi]) if hi > lo else np.zeros(0, dtype="int64")
+
+    def _merge_pending(self):
+        # Adds are buffered in lists and merged into sorted arrays on demand
+        for key, new_ids in self._pending.items():
+            merged = np.asarray(new_ids, dtype="int64")
+            if key in self._postings:
+                merged = np.concatenate([self._postings[key], merged])
+            self._postings[key] = np.unique(merged)
+        self._pending.clear()
+        for field, pairs in self._range_pending.items():
+            if not pairs:
+                continue
+            values = [value for value, _ in pairs]
+            ids = [chunk_id for _, chunk_id in pairs]
+            if field in self._range_columns:
+                old_values, old_ids = self._range_columns[field]
+                values = old_values.tolist() + values
+                ids = old_ids.tolist() + ids
+            values = np.asarray(values)
+            ids = np.asarray(ids, dtype="int64")
+            order = np.argsort(values, kind="stable")
+            self._range_columns[field] = (values[order], ids[order])
+            pairs.clear()
@@ -1,12 +1,84 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import fitz  # PyMuPDF
 
-def load_pdf_text("C://Users//VKUMAR86//Downloads//Explainx.ai_RAG.pdf"):
+
+def load_pdf_text(file_path):
     """
     Extracts text from a PDF file using PyMuPDF.
     """
+    return "".join(text for _, text in iter_pdf_pages(file_path))
+
+
+def iter_pdf_pages(file_path, workers=None, pages_per_task=16):
+    """
+    Yields (page_number, text) for each page of a PDF, in page order.
+
+    With workers > 1 the page ranges are extracted in a process pool, each
+    worker opening its own fitz document. Only a few ranges are in flight at
+    once, so memory stays bounded by a handful of pages rather than the file.
+    """
+    if workers is None or workers <= 1:
+        doc = fitz.open(file_path)
+        try:
+            for page in doc:
+                yield page.number, page.get_text()
+        finally:
+            doc.close()
+        return
+
+    yield from _iter_pdf_pages_parallel(file_path, workers, pages_per_task)
+
+
+def count_pdf_pages(file_path):
+    """
+    Returns the number of pages in a PDF without extracting any text.
+    """
     doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    return text
\ No newline at end of file
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def extract_pool(max_workers):
+    """
+    Returns a process pool for extract_page_range tasks. Workers are spawned
+    rather than forked: callers are usually multi-threaded (ingest stages, a
+    Streamlit server) and forking such a process can deadlock the child.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def extract_page_range(file_path, start, stop):
+    """
+    Opens the PDF and extracts pages [start, stop) as (page_number, text).
+    Used as a process-pool task, so each call opens its own document.
+    """
+    doc = fitz.open(file_path)
+    try:
+        return [(number, doc[number].get_text()) for number in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _iter_pdf_pages_parallel(file_path, workers, pages_per_task):
+    page_count = count_pdf_pages(file_path)
+    ranges = [(start, min(start + pages_per_task, page_count))
+              for start in range(0, page_count, pages_per_task)]
+    max_in_flight = workers * 2
+    file_path = os.fspath(file_path)
+
+    with extract_pool(workers) as pool:
+        pending = deque()
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            # Keep a bounded window of ranges submitted ahead of the consumer
+            while next_range < len(ranges) and len(pending) < max_in_flight:
+                start, stop = ranges[next_range]
+                pending.append(pool.submit(extract_page_range, file_path, start, stop))
+                next_range += 1
+            yield from pending.popleft().result()
@@ -0,0 +1,106 @@
+import heapq
+import math
+import re
+from array import array
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i in into is it its
+me my of on or so such that the their them then there these they this to
+was were what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str, stopwords: frozenset = STOPWORDS) -> List[str]:
+    """
+    Lowercases text and splits it into word tokens, dropping stopwords.
+    """
+    return [token for token in _TOKEN.findall(text.lower()) if token not in stopwords]
+
+
+class BM25Retriever:
+    """
+    Keyword retriever backed by an inverted index with Okapi BM25 scoring.
+
+    The index is built once; a query only touches the postings of its own
+    terms and the best top_k documents are selected with a heap. Instances are
+    callable as retriever(query, documents) so they drop into the pipelines in
+    place of the linear keyword scan.
+
+    index() builds the new structures aside and swaps them in with a single
+    assignment, so concurrent searches see either the old or the new index.
+    """
+    def __init__(self, documents: Sequence[str] = (), k1: float = 1.5, b: float = 0.75,
+                 top_k: int = 5, stopwords: frozenset = STOPWORDS):
+        self.k1 = k1
+        self.b = b
+        self.top_k = top_k
+        self.stopwords = stopwords
+        self.index(documents)
+
+    def index(self, documents: Sequence[str]):
+        """
+        (Re)builds the inverted index over documents.
+        """
+        postings = {}
+        lengths = array("i")
+        for doc_id, doc in enumerate(documents):
+            tokens = tokenize(doc, self.stopwords)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                ids, tfs = postings.setdefault(term, (array("i"), array("i")))
+                ids.append(doc_id)
+                tfs.append(tf)
+
+        n_docs = len(lengths)
+        avg_length = sum(lengths) / n_docs if n_docs else 0.0
+        # Per-document part of the BM25 denominator, so scoring is one lookup
+        length_norm = array("d", (
+            self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+            for length in lengths))
+        idf = {term: math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+               for term, (ids, _) in postings.items()}
+        self._state = (documents, postings, idf, length_norm)
+
+    @property
+    def documents(self) -> Sequence[str]:
+        return self._state[0]
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Returns up to top_k (doc_id, score) pairs, best first. Documents that
+        share no terms with the query are not returned.
+        """
+        return self._search(self._state, query, top_k)
+
+    def _search(self, state, query, top_k):
+        top_k = self.top_k if top_k is None else top_k
+        _, postings, idf_by_term, norm = state
+        scores = {}
+        k1_plus_1 = self.k1 + 1
+        for term in set(tokenize(query, self.stopwords)):
+            posting = postings.get(term)
+            if posting is None:
+                continue
+            idf = idf_by_term[term]
+            for doc_id, tf in zip(*posting):
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * k1_plus_1 / (tf + norm[doc_id])
+        return heapq.nlargest(top_k, scores.items(), key=itemgetter(1))
+
+    def __call__(self, query: str, documents: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Retriever interface used by the pipelines: returns the text of the
+        best matching indexed documents. documents may be omitted; if given it
+        must be the indexed list itself, call index() to search a different one.
+        """
+        state = self._state
+        if documents is not None and documents is not state[0]:
+            raise ValueError("documents is not the indexed list; call index() to search a different one")
+        return [state[0][doc_id] for doc_id, _ in self._search(state, query, None)]
+
@@ -1,7 +1,91 @@
 # Streamlit UI for RAG Pipeline Demo with Metadata Filtering
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 
+from encoder import BatchEncoder, QueryMicroBatcher
+from embedding import get_embedding_model
+from ingest import ingest_directory
+from metadata_index import MetadataIndex
+from vector_store import MANIFEST_FILE, VectorStore
+
+STORE_DIR = os.getenv("RAG_STORE_DIR", "rag_store")
+UPLOAD_DIR = os.getenv("RAG_UPLOAD_DIR", "uploads")
+MODEL_NAME = os.getenv("RAG_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+TOP_K = 5
+
+# -------------------------------
+# Shared Resources
+# -------------------------------
+# Streamlit re-runs this script on every interaction. Everything expensive is
+# created once per process with st.cache_resource and shared by all sessions.
+
+@st.cache_resource
+def get_model():
+    return get_embedding_model(MODEL_NAME)
+
+
+@st.cache_resource
+def get_query_encoder():
+    # Merges concurrent queries from different sessions into one forward pass
+    return QueryMicroBatcher(get_model())
+
+
+class RetrievalBackend:
+    """
+    The persisted vector store and its metadata index, swapped atomically
+    when background ingestion finishes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.store = None
+        self.metadata_index = MetadataIndex()
+        self.reload()
+
+    def reload(self):
+        if not os.path.exists(os.path.join(STORE_DIR, MANIFEST_FILE)):
+            return
+        store = VectorStore.load(STORE_DIR, mmap=True)
+        metadata_index = MetadataIndex.from_vector_store(store)
+        with self._lock:
+            self.store, self.metadata_index = store, metadata_index
+
+    def snapshot(self):
+        with self._lock:
+            return self.store, self.metadata_index
+
+
+@st.cache_resource
+def get_backend():
+    return RetrievalBackend()
+
+
+@st.cache_resource
+def get_ingest_executor():
+    # One ingestion job at a time; the manifest makes each job incremental
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+
+def ingest_uploads(model, backend):
+    # Runs on the ingest thread, which has no script run context: the cached
+    # resources are resolved on the script thread and passed in
+    ingest_directory(UPLOAD_DIR, STORE_DIR, encoder=BatchEncoder(model), progress=lambda line: None)
+    backend.reload()
+
+
+def stream_answer(chunks):
+    """
+    Yields the answer piece by piece so it renders as it is produced.
+    """
+    if not chunks:
+        yield "No relevant documents found for the given query and metadata filter."
+        return
+    for chunk in chunks:
+        yield chunk.strip() + " "
+
 # -------------------------------
 # Page Configuration
 # -------------------------------
@@ -16,6 +100,30 @@ This demo showcases a multi-level RAG pipeline with metadata filtering.
 Enter a query below and optionally apply metadata filters to refine document retrieval.
 """)
 
+# -------------------------------
+# PDF Upload Section
+# -------------------------------
+st.header("📄 Documents")
+uploaded_files = st.file_uploader("Upload PDFs to index:", type="pdf", accept_multiple_files=True)
+if uploaded_files and st.button("Ingest uploaded PDFs"):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    for uploaded in uploaded_files:
+        with open(os.path.join(UPLOAD_DIR, os.path.basename(uploaded.name)), "wb") as f:
+            f.write(uploaded.getbuffer())
+    st.session_state["ingest_job"] = get_ingest_executor().submit(ingest_uploads, get_model(), get_backend())
+
+ingest_job = st.session_state.get("ingest_job")
+if ingest_job is not None:
+    if not ingest_job.done():
+        st.info("Ingesting in the background; queries use the current index until it finishes.")
+    elif ingest_job.exception() is not None:
+        st.error(f"Ingestion failed: {ingest_job.exception()}")
+    else:
+        st.success("Ingestion finished; the index is up to date.")
+
+backend = get_backend()
+store, metadata_index = backend.snapshot()
+
 # -------------------------------
 # Input Section
 # -------------------------------
@@ -27,37 +135,48 @@ query = st.text_input("Enter your question:", placeholder="e.g., What is RAG use
 # -------------------------------
 st.header("🧷 Metadata Filters")
 
-# Simulated metadata options
-topics = ["RAG", "LangChain", "Transformers", "Metadata"]
-sources = ["Wikipedia", "LangChain Docs", "Arxiv", "Blog", "Research Paper"]
+# Filter options come from the metadata index of the loaded store
+sources = metadata_index.values("source")
 
-# Dropdowns for metadata filtering
-selected_topic = st.selectbox("Filter by Topic:", options=["Any"] + topics)
-selected_source = st.selectbox("Filter by Source:", options=["Any"] + sources)
+selected_sources = st.multiselect("Filter by Source:", options=sources)
 
 # Construct metadata filter dictionary
 metadata_filter = {}
-if selected_topic != "Any":
-    metadata_filter["topic"] = selected_topic
-if selected_source != "Any":
-    metadata_filter["source"] = selected_source
+if selected_sources:
+    metadata_filter["source"] = selected_sources
 
 # -------------------------------
 # Submit Button
 # -------------------------------
 if st.button("Run RAG Pipeline"):
-    # Placeholder response logic
     st.subheader("📄 RAG Response")
     if query.strip() == "":
         st.warning("Please enter a query to proceed.")
+    elif store is None:
+        st.warning("No index yet. Upload and ingest some PDFs first.")
     else:
-        # Simulated response output
         st.write(f"**Query:** {query}")
         st.write(f"**Metadata Filter:** {metadata_filter if metadata_filter else 'None'}")
-        st.success("This is a placeholder response from the RAG pipeline.")
+
+        query_embedding = get_query_encoder().encode(query)
+        candidates = metadata_index.compile(metadata_filter)
+        results = store.search_batch(query_embedding.reshape(1, -1), TOP_K, id_filter=candidates)
+
+        # Render each retrieved chunk as soon as its text is fetched
+        st.markdown("**Retrieved chunks:**")
+        chunks = []
+        for chunk_id, score in results.hits(0):
+            text = store.get_chunk(chunk_id)
+            metadata = store.get_metadata(chunk_id) or {}
+            chunks.append(text)
+            with st.expander(f"{metadata.get('source', 'unknown')} · page {metadata.get('page', '?')} · distance {score:.3f}"):
+                st.write(text)
+
+        st.markdown("**Answer:**")
+        st.write_stream(stream_answer(chunks))
 
 # -------------------------------
 # Footer
 # -------------------------------
 st.markdown("---")
-st.caption("© 2024 RAG Demo UI – Streamlit Interface for Multi-Level Retrieval-Augmented Generation")
\ No newline at end of file
+st.caption("© 2024 RAG Demo UI – Streamlit Interface for Multi-Level Retrieval-Augmented Generation")
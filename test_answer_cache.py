@@ -0,0 +1,161 @@
+import asyncio
+
+import numpy as np
+
+from answer_cache import AnswerCache
+from async_executor import AsyncExecutor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TableEncoder:
+    """
+    Maps each query to a fixed vector and counts encode() calls.
+    """
+    def __init__(self, table):
+        self.table = table
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        return np.array([self.table[text] for text in texts], dtype="float32")
+
+
+VECTORS = {
+    "what is rag": [1.0, 0.0, 0.0],
+    "what's rag": [0.99, 0.1, 0.0],
+    "what is langchain": [0.0, 1.0, 0.0],
+}
+
+
+def test_exact_hit_normalizes_query():
+    cache = AnswerCache()
+    cache.put("What is RAG?", "answer")
+    assert cache.get("what  is rag") == "answer"
+    assert cache.get("what is rag", {"topic": "RAG"}) is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_version_change_flushes_cache():
+    version = [1]
+    cache = AnswerCache(version_fn=lambda: version[0])
+    cache.put("q", "old")
+    assert cache.get("q") == "old"
+    version[0] = 2
+    assert cache.get("q") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_put_after_version_change_is_dropped():
+    version = [1]
+    cache = AnswerCache(version_fn=lambda: version[0])
+    answer, miss = cache.lookup("q")
+    assert answer is None and miss.version == 1
+    version[0] = 2  # the corpus changed while the answer was being computed
+    cache.put("q", "stale", miss=miss)
+    assert cache.get("q") is None
+    _, miss = cache.lookup("q")
+    cache.put("q", "fresh", miss=miss)
+    assert cache.get("q") == "fresh"
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = AnswerCache(ttl=10.0, clock=clock)
+    cache.put("q", "answer")
+    clock.now = 9.9
+    assert cache.get("q") == "answer"
+    clock.now = 10.0
+    assert cache.get("q") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_semantic_tier_respects_threshold_and_filter():
+    cache = AnswerCache(encoder=TableEncoder(VECTORS), similarity_threshold=0.95)
+    cache.put("what is rag", "rag answer", {"topic": "RAG"})
+    assert cache.get("what's rag", {"topic": "RAG"}) == "rag answer"
+    assert cache.get("what's rag", {"topic": "LangChain"}) is None
+    assert cache.get("what is langchain", {"topic": "RAG"}) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_entries_expire():
+    clock = Clock()
+    cache = AnswerCache(ttl=10.0, clock=clock, encoder=TableEncoder(VECTORS))
+    cache.put("what is rag", "rag answer")
+    clock.now = 11.0
+    assert cache.get("what's rag") is None
+
+
+def test_query_is_embedded_once_per_miss():
+    encoder = TableEncoder(VECTORS)
+    cache = AnswerCache(encoder=encoder)
+    cache.put("what is langchain", "langchain answer")
+    encoder.calls = 0
+    answer, miss = cache.lookup("what is rag")
+    assert answer is None and miss.vector is not None
+    cache.put("what is rag", "rag answer", miss=miss)
+    assert encoder.calls == 1
+    assert cache.get("what's rag") == "rag answer"
+
+
+def run_cached(executor, cache, queries, compute):
+    async def main():
+        return await asyncio.gather(*(executor.cached(cache, query, None, compute) for query in queries))
+    return asyncio.run(main())
+
+
+def test_cached_exact_hit_runs_no_compute():
+    executor = AsyncExecutor(max_workers=2)
+    cache = AnswerCache()
+    cache.put("q", "cached")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return "computed"
+
+    try:
+        assert run_cached(executor, cache, ["q"] * 10, compute) == ["cached"] * 10
+        assert calls == []
+        assert run_cached(executor, cache, ["other"], compute) == ["computed"]
+        assert calls == [1]
+        assert cache.get("other") == "computed"
+    finally:
+        executor.shutdown()
+
+
+def test_cached_semantic_hit_cancels_compute():
+    executor = AsyncExecutor(max_workers=2)
+    cache = AnswerCache(encoder=TableEncoder(VECTORS))
+    cache.put("what is rag", "rag answer")
+    finished = []
+
+    async def compute():
+        await asyncio.sleep(1.0)
+        finished.append(1)
+        return "computed"
+
+    try:
+        assert run_cached(executor, cache, ["what's rag"], compute) == ["rag answer"]
+        assert finished == []
+    finally:
+        executor.shutdown()
@@ -0,0 +1,103 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+
+
+def vectors(*values):
+    return np.array([[value] * 4 for value in values], dtype="float32")
+
+
+def open_cache(path, capacity=4):
+    return EmbeddingCache(str(path), MODEL, capacity=capacity)
+
+
+def cached(cache, text):
+    positions, hit_vectors, _ = cache.lookup([text])
+    return hit_vectors[0][0] if positions else None
+
+
+def test_round_trip(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put(["a", "b"], vectors(1, 2))
+    cache.close()
+    cache = open_cache(tmp_path)
+    assert len(cache) == 2
+    assert cached(cache, "a") == 1 and cached(cache, "b") == 2
+    assert cached(cache, "a  ") == 1  # whitespace is normalized
+
+
+def test_stale_index_does_not_return_reused_rows(tmp_path):
+    cache = open_cache(tmp_path, capacity=2)
+    cache.put(["a", "b"], vectors(1, 2))
+    cache.flush()
+    cache.put(["c"], vectors(3))  # evicts "a" and reuses its row, index not flushed
+    cache._vectors.flush()
+    cache._row_keys.flush()
+    cache = open_cache(tmp_path, capacity=2)
+    assert cached(cache, "a") is None
+    assert cached(cache, "b") == 2
+
+
+def torn_flush(path):
+    # Index files from a later flush next to the slots of an earlier one
+    cache = open_cache(path)
+    cache.put(["a", "b", "c"], vectors(1, 2, 3))
+    cache.flush()
+    old_slots = os.path.join(cache.path, EmbeddingCache.SLOTS_FILE)
+    shutil.copy(old_slots, str(path / "old_slots.npy"))
+    cache.put(["d"], vectors(4))
+    cache.flush()
+    shutil.copy(str(path / "old_slots.npy"), old_slots)
+    return cache.path
+
+
+def truncate_keys(path):
+    cache = open_cache(path)
+    cache.put(["a", "b"], vectors(1, 2))
+    cache.flush()
+    keys = os.path.join(cache.path, EmbeddingCache.KEYS_FILE)
+    with open(keys, "r+b") as f:
+        f.truncate(3)
+    return cache.path
+
+
+def remove_slots(path):
+    cache = open_cache(path)
+    cache.put(["a", "b"], vectors(1, 2))
+    cache.flush()
+    os.remove(os.path.join(cache.path, EmbeddingCache.SLOTS_FILE))
+    return cache.path
+
+
+def truncate_meta(path):
+    cache = open_cache(path)
+    cache.put(["a", "b"], vectors(1, 2))
+    cache.flush()
+    with open(os.path.join(cache.path, EmbeddingCache.META_FILE), "w") as f:
+        f.write('{"model_na')
+    return cache.path
+
+
+@pytest.mark.parametrize("tear", [torn_flush, truncate_keys, remove_slots, truncate_meta])
+def test_torn_flush_starts_empty(tear, tmp_path):
+    tear(tmp_path)
+    cache = open_cache(tmp_path)
+    assert len(cache) == 0
+    assert cached(cache, "a") is None
+    cache.put(["e", "f"], vectors(5, 6))
+    cache.close()
+    cache = open_cache(tmp_path)
+    assert cached(cache, "e") == 5 and cached(cache, "f") == 6
+
+
+def test_flush_leaves_no_temporary_files(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put(["a"], vectors(1))
+    cache.flush()
+    assert not [name for name in os.listdir(cache.path) if name.endswith(".tmp")]
@@ -0,0 +1,58 @@
+# Import-time budget for the keyword-only (BM25) path. Each probe runs in a
+# fresh interpreter so modules already imported by the test session do not
+# hide a regression.
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Modules a keyword-only process is expected to import
+KEYWORD_MODULES = [
+    "level1_basic_rag",
+    "level2_modular_rag",
+    "level5_agent_chatbot",
+    "sparse_retriever",
+    "answer_cache",
+    "async_executor",
+    "config",
+]
+
+# Modules that must only be imported once the lazy dependency is first used
+LAZY_MODULES = ["embedding", "encoder", "vector_store", "hybrid_retriever", "ingest"]
+
+FORBIDDEN = ("torch", "sentence_transformers", "faiss", "dotenv")
+BUDGET_SECONDS = 1.0
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+loaded = sorted(m for m in {forbidden!r} if m in sys.modules)
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def probe(modules):
+    """
+    Imports modules in a fresh interpreter; returns (seconds, forbidden modules loaded).
+    """
+    code = _PROBE.format(modules=modules, forbidden=FORBIDDEN)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["elapsed"], result["loaded"]
+
+
+def test_keyword_path_stays_light():
+    elapsed, loaded = probe(KEYWORD_MODULES)
+    assert loaded == []
+    assert elapsed < BUDGET_SECONDS, f"keyword path took {elapsed:.2f}s (budget {BUDGET_SECONDS:.2f}s)"
+
+
+@pytest.mark.parametrize("module", LAZY_MODULES)
+def test_lazy_module_defers_heavy_imports(module):
+    _, loaded = probe([module])
+    assert loaded == []
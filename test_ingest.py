@@ -0,0 +1,126 @@
+import json
+import os
+import random
+
+import fitz  # PyMuPDF
+import pytest
+
+from embedding import HashingEmbedder
+from encoder import BatchEncoder
+from ingest import MANIFEST_FILE, IngestPipeline
+from vector_store import VectorStore
+
+encoder = BatchEncoder(HashingEmbedder(dim=64))
+
+
+def write_pdf(path, words, pages=3, seed=0):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        text = f"{words} page {number} " + " ".join(f"w{rng.randrange(1000)}" for _ in range(80))
+        page.insert_textbox(fitz.Rect(72, 72, 540, 770), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def ingest(pdf_dir, store_dir, **kwargs):
+    kwargs = {"chunk_size": 200, "overlap": 20, **kwargs}
+    pipeline = IngestPipeline(encoder, str(store_dir), extract_workers=1, progress=lambda message: None, **kwargs)
+    return pipeline.run(str(pdf_dir))
+
+
+def texts(store, doc_id):
+    return [store.get_chunk(int(i)) for i in store.document_chunk_ids(doc_id)]
+
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    for n in range(3):
+        write_pdf(pdf_dir / f"f{n}.pdf", f"file{n} original", seed=n)
+    return pdf_dir
+
+
+def test_rerun_skips_unchanged_files(pdf_dir, tmp_path):
+    store_dir = tmp_path / "store"
+    first = ingest(pdf_dir, store_dir)
+    assert first["files"] == 3 and first["skipped"] == 0 and first["indexed"] > 0
+    before = VectorStore.load(str(store_dir))
+    second = ingest(pdf_dir, store_dir)
+    assert second["files"] == 3 and second["skipped"] == 3
+    assert second["pages"] == second["indexed"] == 0
+    after = VectorStore.load(str(store_dir))
+    assert len(after) == len(before) == first["indexed"]
+    for n in range(3):
+        assert texts(after, f"f{n}.pdf") == texts(before, f"f{n}.pdf")
+
+
+def test_changed_file_replaces_its_chunks(pdf_dir, tmp_path):
+    store_dir = tmp_path / "store"
+    ingest(pdf_dir, store_dir)
+    before = VectorStore.load(str(store_dir))
+    write_pdf(pdf_dir / "f1.pdf", "file1 revised", pages=2, seed=10)
+    stats = ingest(pdf_dir, store_dir)
+    assert stats["skipped"] == 2
+    store = VectorStore.load(str(store_dir))
+    revised = texts(store, "f1.pdf")
+    assert revised and all("original" not in text for text in revised)
+    assert "file1 revised" in revised[0]
+    assert len(store) == len(before) - len(before.document_chunk_ids("f1.pdf")) + len(revised)
+    assert texts(store, "f0.pdf") == texts(before, "f0.pdf")
+    assert store.search(encoder.encode(revised[0]), 1) == [revised[0]]
+
+
+def test_removed_file_is_deleted(pdf_dir, tmp_path):
+    store_dir = tmp_path / "store"
+    ingest(pdf_dir, store_dir)
+    os.remove(pdf_dir / "f2.pdf")
+    stats = ingest(pdf_dir, store_dir)
+    assert stats["deleted"] == 1 and stats["skipped"] == 2
+    store = VectorStore.load(str(store_dir))
+    assert len(store.document_chunk_ids("f2.pdf")) == 0
+    assert {metadata["source"] for _, metadata in store.iter_metadata()} == {"f0.pdf", "f1.pdf"}
+    with open(store_dir / MANIFEST_FILE) as f:
+        assert sorted(json.load(f)) == ["f0.pdf", "f1.pdf"]
+
+
+def test_ivf_index_is_trained_on_buffered_vectors(pdf_dir, tmp_path):
+    store_dir = tmp_path / "store"
+    stats = ingest(pdf_dir, store_dir, index_type="ivf_flat", nlist=4)
+    store = VectorStore.load(str(store_dir))
+    assert store.index.is_trained
+    assert len(store) == stats["indexed"] > 4
+    for n in range(3):
+        chunk = texts(store, f"f{n}.pdf")[0]
+        assert chunk in store.search(encoder.encode(chunk), 3, nprobe=4)
+
+
+def test_too_few_chunks_to_train(pdf_dir, tmp_path):
+    store_dir = tmp_path / "store"
+    with pytest.raises(ValueError, match="too few to train"):
+        ingest(pdf_dir, store_dir, index_type="ivf_flat", nlist=256)
+    assert not os.path.exists(store_dir / MANIFEST_FILE)
+
+
+def test_duplicate_chunks_are_merged_when_enabled(tmp_path):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    footer = "Confidential. Do not distribute this manual without written permission of the publisher."
+    doc = fitz.open()
+    for number in range(4):
+        doc.new_page().insert_textbox(fitz.Rect(72, 72, 540, 770), footer)
+    page_size = len(doc[0].get_text())  # one chunk per page
+    doc.save(str(pdf_dir / "manual.pdf"))
+    doc.close()
+
+    stats = ingest(pdf_dir, tmp_path / "plain", chunk_size=page_size, overlap=0)
+    assert stats["duplicates"] == 0 and stats["indexed"] == 4
+
+    stats = ingest(pdf_dir, tmp_path / "dedup", chunk_size=page_size, overlap=0, dedup_threshold=0.8)
+    assert stats["duplicates"] == 3 and stats["indexed"] == 1
+    store = VectorStore.load(str(tmp_path / "dedup"))
+    [(_, metadata)] = store.iter_metadata()
+    assert metadata["pages"] == [0, 1, 2, 3]
+    assert [span[0] for span in metadata["duplicates"]] == [1, 2, 3]
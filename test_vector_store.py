@@ -0,0 +1,183 @@
+import random
+
+import numpy as np
+import pytest
+
+from embedding import HashingEmbedder
+from vector_store import CODECS, INDEX_TYPES, VectorStore
+
+DIM = 64
+INDEX_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": 4},
+    "ivf_pq": {"nlist": 4, "pq_m": 8, "pq_nbits": 4},
+    "hnsw": {"hnsw_m": 8},
+}
+# Searches probe every IVF list so results do not depend on clustering
+SEARCH_PARAMS = {"flat": {}, "ivf_flat": {"nprobe": 4}, "ivf_pq": {"nprobe": 4}, "hnsw": {"ef_search": 64}}
+
+embedder = HashingEmbedder(dim=DIM)
+
+
+def make_documents(num_docs=8, chunks_per_doc=40, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(500)]
+    return {f"doc{d}.pdf": [f"doc{d} chunk{c} " + " ".join(rng.choices(vocab, k=12))
+                            for c in range(chunks_per_doc)]
+            for d in range(num_docs)}
+
+
+def make_store(index_type, documents, **kwargs):
+    store = VectorStore(DIM, index_type, compact_threshold=kwargs.pop("compact_threshold", 0.25),
+                        **INDEX_PARAMS[index_type], **kwargs)
+    store.train(embedder.encode([text for chunks in documents.values() for text in chunks]))
+    for doc_id, chunks in documents.items():
+        metadatas = [{"source": doc_id, "chunk": i} for i in range(len(chunks))]
+        store.add_embeddings(embedder.encode(chunks), chunks, metadatas, doc_id=doc_id)
+    return store
+
+
+def search(store, text, top_k=5, **kwargs):
+    return store.search(embedder.encode(text), top_k, **SEARCH_PARAMS[store.index_type], **kwargs)
+
+
+def live_texts(store):
+    return {store.get_chunk(chunk_id) for chunk_id, _ in store.iter_metadata()}
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return make_documents()
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_add_and_search(index_type, documents):
+    store = make_store(index_type, documents)
+    assert len(store) == sum(len(chunks) for chunks in documents.values())
+    for chunks in documents.values():
+        assert chunks[3] in search(store, chunks[3])
+    ids = store.document_chunk_ids("doc2.pdf")
+    assert [store.get_chunk(i) for i in ids] == documents["doc2.pdf"]
+    assert store.get_metadata(int(ids[5])) == {"source": "doc2.pdf", "chunk": 5}
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_search_empty_store(index_type):
+    store = VectorStore(DIM, index_type, **INDEX_PARAMS[index_type])
+    assert search(store, "anything") == []
+    results = store.search_batch(embedder.encode(["a", "b"]), 3)
+    assert results.ids.shape == (2, 3) and (results.ids == -1).all() and np.isinf(results.scores).all()
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_delete_document(index_type, documents):
+    store = make_store(index_type, documents, compact_threshold=1.0)
+    removed = documents["doc1.pdf"]
+    removed_id = int(store.document_chunk_ids("doc1.pdf")[0])
+    assert store.delete_document("doc1.pdf") == len(removed)
+    assert store.delete_document("doc1.pdf") == 0
+    assert len(store) == sum(len(chunks) for chunks in documents.values()) - len(removed)
+    assert len(store.document_chunk_ids("doc1.pdf")) == 0
+    for text in removed[:10]:
+        assert not set(search(store, text, top_k=10)) & set(removed)
+    with pytest.raises(KeyError):
+        store.get_chunk(removed_id)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_upsert_document(index_type, documents):
+    store = make_store(index_type, documents)
+    new_chunks = ["doc3 replacement alpha beta gamma", "doc3 replacement delta epsilon"]
+    old_ids = store.document_chunk_ids("doc3.pdf")
+    new_ids = store.upsert_document("doc3.pdf", embedder.encode(new_chunks), new_chunks)
+    assert new_ids.min() > old_ids.max()
+    assert list(store.document_chunk_ids("doc3.pdf")) == list(new_ids)
+    assert new_chunks[0] in search(store, new_chunks[0])
+    assert not live_texts(store) & set(documents["doc3.pdf"])
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_id_filter(index_type, documents):
+    store = make_store(index_type, documents, compact_threshold=1.0)
+    store.delete_document("doc0.pdf")
+    allowed = store.document_chunk_ids("doc4.pdf")[:5]
+    query = documents["doc0.pdf"][0]
+    results = search(store, query, top_k=10, id_filter=np.concatenate([allowed, [0, 1]]))
+    assert set(results) <= {store.get_chunk(int(i)) for i in allowed}
+    assert search(store, query, id_filter=[]) == []
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_save_and_load_mmap(index_type, documents, tmp_path):
+    store = make_store(index_type, documents, compact_threshold=1.0)
+    store.delete_document("doc5.pdf")
+    store.save(tmp_path)
+    loaded = VectorStore.load(tmp_path, mmap=True)
+    assert loaded._mapped
+    assert len(loaded) == len(store)
+    assert loaded.version == store.version
+    assert live_texts(loaded) == live_texts(store)
+    for chunks in documents.values():
+        assert search(loaded, chunks[7]) == search(store, chunks[7])
+    assert list(loaded.document_chunk_ids("doc6.pdf")) == list(store.document_chunk_ids("doc6.pdf"))
+    assert len(loaded.document_chunk_ids("doc5.pdf")) == 0
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_add_after_load(index_type, documents, tmp_path):
+    make_store(index_type, documents).save(tmp_path)
+    loaded = VectorStore.load(tmp_path, mmap=True)
+    next_id = loaded._next_id
+    new_chunks = ["late arrival one two three", "late arrival four five six"]
+    ids = loaded.add_embeddings(embedder.encode(new_chunks), new_chunks, doc_id="late.pdf")
+    assert list(ids) == [next_id, next_id + 1]
+    assert not loaded._mapped
+    assert new_chunks[1] in search(loaded, new_chunks[1])
+    loaded.delete_document("doc0.pdf")
+    loaded.save(tmp_path)
+    reloaded = VectorStore.load(tmp_path, mmap=True)
+    assert live_texts(reloaded) == live_texts(loaded)
+    assert new_chunks[0] in live_texts(reloaded)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_compact(index_type, documents, tmp_path):
+    store = make_store(index_type, documents, compact_threshold=1.0)
+    for doc_id in ("doc0.pdf", "doc2.pdf", "doc4.pdf"):
+        store.delete_document(doc_id)
+    kept_ids = store.document_chunk_ids("doc7.pdf")
+    before = {text: search(store, text) for text in documents["doc7.pdf"][:5]}
+    assert store.dead_fraction > 0
+    store.compact()
+    assert store.dead_fraction == 0
+    assert len(store._ids) == len(store)
+    assert list(store.document_chunk_ids("doc7.pdf")) == list(kept_ids)
+    assert [store.get_chunk(int(i)) for i in kept_ids] == documents["doc7.pdf"]
+    for text, results in before.items():
+        assert text in search(store, text)
+        if index_type != "hnsw":  # a rebuilt graph may order near ties differently
+            assert search(store, text) == results
+    store.save(tmp_path)
+    assert live_texts(VectorStore.load(tmp_path)) == live_texts(store)
+
+
+def test_automatic_compaction(documents):
+    store = make_store("hnsw", documents, compact_threshold=0.25)
+    for doc_id in ("doc0.pdf", "doc1.pdf"):
+        store.delete_document(doc_id)
+    assert store.dead_fraction == 0.25
+    store.delete_document("doc2.pdf")
+    assert store.dead_fraction == 0
+    assert len(store._ids) == len(store) == 5 * 40
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_id_filter_with_codecs(codec, documents):
+    # A flat PQ index takes no IDSelector; the filter is applied after the search
+    store = make_store("flat", documents, codec=codec, rerank_factor=1, pq_m=8, pq_nbits=4)
+    allowed = store.document_chunk_ids("doc4.pdf")[:5]
+    allowed_texts = {store.get_chunk(int(i)) for i in allowed}
+    for query in documents["doc0.pdf"][:3] + documents["doc4.pdf"][:2]:
+        results = search(store, query, top_k=3, id_filter=allowed)
+        assert len(results) == 3
+        assert set(results) <= allowed_texts
@@ -1,11 +1,157 @@
+import re
+from collections import deque
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s)")
+_WHITESPACE = re.compile(r"\s+")
+
+BOUNDARY_MODES = ("char", "token", "sentence")
+
+
+class Chunk:
+    """
+    A chunk of a document described by character offsets.
+
+    start/end are offsets into the concatenated page texts of the document and
+    page is the page the chunk starts on. The text itself is only sliced out of
+    the underlying page strings when .text is accessed.
+    """
+    __slots__ = ("doc_id", "page", "start", "end", "_parts")
+
+    def __init__(self, doc_id, page, start, end, parts):
+        self.doc_id = doc_id
+        self.page = page
+        self.start = start
+        self.end = end
+        self._parts = parts  # ((page_offset, page_text), ...) spanned by the chunk
+
+    @property
+    def text(self):
+        pieces = []
+        for offset, page_text in self._parts:
+            lo = max(self.start - offset, 0)
+            hi = min(self.end - offset, len(page_text))
+            if hi > lo:
+                pieces.append(page_text[lo:hi])
+        return "".join(pieces)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def detach(self):
+        """
+        Returns an equal Chunk holding only its own text, not the page strings
+        it was sliced from, for callers that keep chunks around.
+        """
+        return Chunk(self.doc_id, self.page, self.start, self.end, ((self.start, self.text),))
+
+    def __repr__(self):
+        return (f"Chunk(doc_id={self.doc_id!r}, page={self.page}, "
+                f"start={self.start}, end={self.end})")
+
+
 def split_text(text, chunk_size=500, overlap=50):
     """
     Splits the input text into overlapping chunks.
     """
-    chunks = []
+    return [chunk.text for chunk in iter_chunks([text], chunk_size=chunk_size, overlap=overlap)]
+
+
+def iter_chunks(pages, doc_id=None, chunk_size=500, overlap=50, boundary="char"):
+    """
+    Yields Chunk records from an iterable of page texts.
+
+    pages may contain plain strings or (page_number, text) pairs such as those
+    produced by pdf_loader.iter_pdf_pages. Chunks may span page boundaries.
+    Only the pages overlapping the current window are held, so memory does not
+    grow with the size of the document.
+
+    boundary selects where a chunk may end:
+        "char"     -- exactly chunk_size characters (same as split_text)
+        "token"    -- the last whitespace inside the window
+        "sentence" -- the last sentence end inside the window, else a token boundary
+    """
+    if overlap < 0 or overlap >= chunk_size:
+        raise ValueError("overlap must be in the range [0, chunk_size)")
+    if boundary not in BOUNDARY_MODES:
+        raise ValueError(f"boundary must be one of {BOUNDARY_MODES}, got {boundary!r}")
+
+    page_iter = iter(_numbered(pages))
+    buffered = deque()  # (page_number, offset, text)
+    buffered_end = 0
+    exhausted = False
     start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
-    return chunks
\ No newline at end of file
+
+    while True:
+        # Pull pages until the next window is fully buffered
+        while not exhausted and buffered_end < start + chunk_size:
+            try:
+                page_number, page_text = next(page_iter)
+            except StopIteration:
+                exhausted = True
+                break
+            if page_text:
+                buffered.append((page_number, buffered_end, page_text))
+                buffered_end += len(page_text)
+
+        if start >= buffered_end:
+            return
+
+        # Drop pages that end before the window starts
+        while buffered and buffered[0][1] + len(buffered[0][2]) <= start:
+            buffered.popleft()
+
+        end = min(start + chunk_size, buffered_end)
+        parts = tuple((offset, page_text) for _, offset, page_text in buffered if offset < end)
+        is_last = exhausted and end == buffered_end
+
+        if boundary != "char" and not is_last:
+            end = _snap_end(Chunk(doc_id, None, start, end, parts).text, start, overlap, boundary)
+            parts = tuple(part for part in parts if part[0] < end)
+
+        yield Chunk(doc_id, buffered[0][0], start, end, parts)
+
+        if boundary == "char":
+            start += chunk_size - overlap
+        elif is_last:
+            return
+        else:
+            start = end - overlap
+
+
+def _numbered(pages):
+    for position, page in enumerate(pages):
+        if isinstance(page, str):
+            yield position, page
+        else:
+            yield page
+
+
+def _snap_end(window, start, overlap, boundary):
+    """
+    Moves a window end back to the last allowed boundary, keeping the chunk
+    longer than the overlap so the next window still advances.
+    """
+    cut = None
+    if boundary == "sentence":
+        cut = _last_match_end(_SENTENCE_END, window, overlap)
+    if cut is None:
+        cut = _last_match_start(_WHITESPACE, window, overlap)
+    if cut is None:
+        cut = len(window)
+    return start + cut
+
+
+def _last_match_end(pattern, window, minimum):
+    cut = None
+    for match in pattern.finditer(window):
+        if match.end() > minimum:
+            cut = match.end()
+    return cut
+
+
+def _last_match_start(pattern, window, minimum):
+    cut = None
+    for match in pattern.finditer(window):
+        if match.start() > minimum:
+            cut = match.start()
+    return cut
@@ -0,0 +1,271 @@
+"""
+Lightweight per-stage tracing and metrics.
+
+Components take an optional tracer and fall back to the process-wide one from
+get_tracer(), which is a no-op until set_tracer() installs a real Tracer:
+
+    tracer = Tracer([PrometheusSink(), JSONLogSink("trace.jsonl")])
+    set_tracer(tracer)
+    ...
+    print(tracer.sinks[0].render())
+
+Stages are timed with `with tracer.span("modular.retrieve"):` and events are
+counted with tracer.count("vector_store.returned", n). Spans opened inside
+another span record it as their parent, also across threads started through
+AsyncExecutor.run().
+"""
+
+import bisect
+import contextvars
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed stage. Use as a context manager; set() attaches attributes that
+    are passed to the sinks with the duration.
+    """
+    __slots__ = ("tracer", "name", "attrs", "parent", "started", "duration", "_token")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.started = None
+        self.duration = None
+        self._token = None
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent = parent.name if parent is not None else None
+        self._token = _current_span.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._emit_span(self)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class NoopTracer:
+    """
+    Tracer that records nothing; span() returns a shared do-nothing object.
+    """
+    enabled = False
+    sinks = ()
+
+    def span(self, name, **attrs):
+        return _NOOP_SPAN
+
+    def count(self, name, value=1, **labels):
+        pass
+
+
+class Tracer:
+    """
+    Times spans and counts events, forwarding both to every sink.
+
+    A sink is any object with record_span(name, seconds, parent, attrs) and
+    record_count(name, value, labels) methods.
+    """
+    enabled = True
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def count(self, name, value=1, **labels):
+        for sink in self.sinks:
+            sink.record_count(name, value, labels)
+
+    def _emit_span(self, span):
+        for sink in self.sinks:
+            sink.record_span(span.name, span.duration, span.parent, span.attrs)
+
+
+class HistogramSink:
+    """
+    Aggregates span durations into fixed-bucket histograms and sums counters
+    in memory. The most recent max_samples durations per span name are kept
+    for exact percentiles in summary().
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_samples=10_000):
+        self.buckets = tuple(buckets)
+        self.max_samples = max_samples
+        self.histograms = {}  # name -> [bucket counts..., +Inf count]
+        self.sums = {}
+        self.samples = {}
+        self.counters = {}  # (name, sorted label items) -> total
+        self._lock = threading.Lock()
+
+    def record_span(self, name, seconds, parent, attrs):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [0] * (len(self.buckets) + 1)
+                self.sums[name] = 0.0
+                self.samples[name] = deque(maxlen=self.max_samples)
+            histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.sums[name] += seconds
+            self.samples[name].append(seconds)
+
+    def record_count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """
+        Returns {span name: {count, mean_ms, p50_ms, p95_ms, p99_ms}} and
+        {counter name: total} (counters summed over labels).
+        """
+        with self._lock:
+            spans = {}
+            for name, histogram in self.histograms.items():
+                samples = sorted(self.samples[name])
+                count = sum(histogram)
+                spans[name] = {
+                    "count": count,
+                    "mean_ms": 1000.0 * self.sums[name] / count,
+                    "p50_ms": 1000.0 * _percentile(samples, 0.50),
+                    "p95_ms": 1000.0 * _percentile(samples, 0.95),
+                    "p99_ms": 1000.0 * _percentile(samples, 0.99),
+                }
+            counters = {}
+            for (name, _), value in self.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return {"spans": spans, "counters": counters}
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.sums.clear()
+            self.samples.clear()
+            self.counters.clear()
+
+
+class PrometheusSink(HistogramSink):
+    """
+    HistogramSink that renders its state in the Prometheus text exposition
+    format, e.g. for a /metrics endpoint.
+    """
+    def __init__(self, namespace="rag", buckets=DEFAULT_BUCKETS):
+        super().__init__(buckets)
+        self.namespace = namespace
+
+    def render(self):
+        metric = f"{self.namespace}_stage_duration_seconds"
+        lines = [f"# HELP {metric} Duration of pipeline stages.", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name in sorted(self.histograms):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self.histograms[name]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {self.sums[name]!r}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {cumulative}')
+            declared = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                counter = f"{self.namespace}_{_metric_name(name)}_total"
+                if counter not in declared:
+                    lines.append(f"# TYPE {counter} counter")
+                    declared.add(counter)
+                label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+                lines.append(f"{counter}{{{label_text}}} {value}" if label_text else f"{counter} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class JSONLogSink:
+    """
+    Writes one JSON object per span or counter event to a file path or stream.
+    """
+    def __init__(self, target=sys.stderr):
+        self._owned = isinstance(target, str)
+        self.stream = open(target, "a", encoding="utf-8") if self._owned else target
+        self._lock = threading.Lock()
+
+    def record_span(self, name, seconds, parent, attrs):
+        self._write({"type": "span", "name": name, "parent": parent,
+                     "duration_ms": 1000.0 * seconds, "attrs": attrs})
+
+    def record_count(self, name, value, labels):
+        self._write({"type": "count", "name": name, "value": value, "labels": labels})
+
+    def close(self):
+        if self._owned:
+            self.stream.close()
+
+    def _write(self, event):
+        event["ts"] = time.time()
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+
+
+NOOP_TRACER = NoopTracer()
+_tracer = NOOP_TRACER
+
+
+def get_tracer():
+    """
+    Returns the process-wide tracer (a NoopTracer unless set_tracer() was called).
+    """
+    return _tracer
+
+
+def set_tracer(tracer):
+    """
+    Installs the process-wide tracer; None restores the no-op tracer.
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else NOOP_TRACER
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,26 +1,846 @@
-import faiss
+import json
+import os
+import shutil
+import tempfile
+import time
+
 import numpy as np
 
+from lazy_import import LazyModule
+from tracing import get_tracer
+
+faiss = LazyModule("faiss")  # imported on first use
+
+FORMAT_VERSION = 4
+INDEX_FILE = "index.faiss"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_PREFIX = "snapshot-"
+_LEGACY_FILES = (INDEX_FILE, "chunks.data.npy", "chunks.offsets.npy", "metadata.data.npy", "metadata.offsets.npy",
+                 "documents.data.npy", "documents.offsets.npy", "chunk_ids.npy", "doc_codes.npy", "alive.npy",
+                 "vectors.npy")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+CODECS = ("float32", "float16", "int8", "pq")
+
+
+def build_index(embedding_dim, index_type="flat", codec="float32", nlist=1024, pq_m=16, pq_nbits=8,
+                hnsw_m=32, ef_construction=40):
+    """
+    Creates an empty FAISS index of the given type.
+
+    "flat" is exact brute force. "ivf_flat" and "ivf_pq" partition vectors into
+    nlist clusters (PQ also compresses them to pq_m codes of pq_nbits bits) and
+    need training. "hnsw" is a graph index with hnsw_m links per node.
+
+    codec sets how "flat", "ivf_flat" and "hnsw" store vectors: "float32" as
+    is, "float16" (2 bytes per dimension), "int8" (scalar quantization, 1 byte
+    per dimension, trained) or "pq" (pq_m codes of pq_nbits bits, trained).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"codec must be one of {CODECS}, got {codec!r}")
+    if index_type == "flat":
+        if codec == "float32":
+            return faiss.IndexFlatL2(embedding_dim)
+        return faiss.index_factory(embedding_dim, _codec_factory(codec, pq_m, pq_nbits))
+    if index_type == "ivf_flat":
+        return faiss.index_factory(embedding_dim, f"IVF{nlist},{_codec_factory(codec, pq_m, pq_nbits)}")
+    if index_type == "ivf_pq":
+        if codec != "float32":
+            raise ValueError("ivf_pq always stores PQ codes; use ivf_flat with a codec instead")
+        return faiss.index_factory(embedding_dim, f"IVF{nlist},PQ{pq_m}x{pq_nbits}")
+    if index_type == "hnsw":
+        if codec == "float32":
+            index = faiss.IndexHNSWFlat(embedding_dim, hnsw_m)
+        elif codec == "pq":
+            index = faiss.IndexHNSWPQ(embedding_dim, pq_m, hnsw_m, pq_nbits)
+        else:
+            qtype = faiss.ScalarQuantizer.QT_fp16 if codec == "float16" else faiss.ScalarQuantizer.QT_8bit
+            index = faiss.IndexHNSWSQ(embedding_dim, qtype, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+
+
+def _codec_factory(codec, pq_m, pq_nbits):
+    return {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8", "pq": f"PQ{pq_m}x{pq_nbits}"}[codec]
+
+
+class GrowableArray:
+    """
+    A numpy array with amortized O(1) appends along its first axis.
+    """
+    def __init__(self, dtype, data=None, row_shape=()):
+        self._data = np.zeros((0,) + tuple(row_shape), dtype=dtype) if data is None else data
+        self._size = len(self._data)
+
+    def __len__(self):
+        return self._size
+
+    def view(self):
+        return self._data[:self._size]
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self._size + len(values)
+        # Grow geometrically; this also copies a read-only memory map into RAM
+        if needed > len(self._data) or not self._data.flags.writeable:
+            grown = np.empty((max(needed, 2 * len(self._data)),) + self._data.shape[1:], dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def make_writable(self):
+        if not self._data.flags.writeable:
+            self._data = np.array(self._data[:self._size])
+
+    def save(self, file_path):
+        _save_array(file_path, self.view())
+
+    @classmethod
+    def load(cls, file_path, mmap=True):
+        data = np.load(file_path, mmap_mode="r" if mmap else None)
+        return cls(data.dtype, data)
+
+
+class PackedStrings:
+    """
+    A list of strings stored as one UTF-8 byte buffer plus an offsets array.
+
+    String i is data[offsets[i]:offsets[i + 1]]. Both arrays can be memory
+    mapped from disk, in which case strings are decoded only when indexed and
+    the pages are shared between processes through the OS page cache.
+    """
+    def __init__(self, data=None, offsets=None):
+        self._data = np.zeros(0, dtype="uint8") if data is None else data
+        self._offsets = np.zeros(1, dtype="int64") if offsets is None else offsets
+        self._size = len(self._offsets) - 1
+        self._nbytes = int(self._offsets[-1])
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("string index out of range")
+        return self._data[self._offsets[i]:self._offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def extend(self, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        lengths = np.fromiter((len(b) for b in encoded), dtype="int64", count=len(encoded))
+        needed_bytes = self._nbytes + int(lengths.sum())
+        needed_rows = self._size + len(encoded) + 1
+        # Grow geometrically; this also copies a read-only memory map into RAM
+        if needed_bytes > len(self._data) or not self._data.flags.writeable:
+            grown = np.empty(max(needed_bytes, 2 * len(self._data)), dtype="uint8")
+            grown[:self._nbytes] = self._data[:self._nbytes]
+            self._data = grown
+        if needed_rows > len(self._offsets) or not self._offsets.flags.writeable:
+            grown = np.empty(max(needed_rows, 2 * len(self._offsets)), dtype="int64")
+            grown[:self._size + 1] = self._offsets[:self._size + 1]
+            self._offsets = grown
+        if encoded:
+            self._data[self._nbytes:needed_bytes] = np.frombuffer(b"".join(encoded), dtype="uint8")
+        self._offsets[self._size + 1:needed_rows] = self._nbytes + np.cumsum(lengths)
+        self._size += len(encoded)
+        self._nbytes = needed_bytes
+
+    def take(self, rows):
+        """
+        Returns a new PackedStrings holding only the given rows, in order.
+        """
+        rows = np.asarray(rows, dtype="int64")
+        starts = self._offsets[rows]
+        lengths = self._offsets[rows + 1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype="int64")
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return PackedStrings(self._data[gather], offsets)
+
+    def save(self, path, name):
+        _save_array(os.path.join(path, f"{name}.data.npy"), self._data[:self._nbytes])
+        _save_array(os.path.join(path, f"{name}.offsets.npy"), self._offsets[:self._size + 1])
+
+    @classmethod
+    def load(cls, path, name, mmap=True):
+        mmap_mode = "r" if mmap else None
+        data = np.load(os.path.join(path, f"{name}.data.npy"), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode=mmap_mode)
+        return cls(data, offsets)
+
+
+class SearchResults:
+    """
+    Results of VectorStore.search_batch() for N queries.
+
+    ids and scores are (N, top_k) arrays; scores are L2 distances (lower is
+    closer). Slots with no result, e.g. when the index holds fewer than top_k
+    chunks, have id -1 and score inf and are skipped by hits() and chunks().
+    """
+    __slots__ = ("ids", "scores", "_store")
+
+    def __init__(self, ids, scores, store):
+        self.ids = ids
+        self.scores = scores
+        self._store = store
+
+    def __len__(self):
+        return len(self.ids)
+
+    def hits(self, i):
+        """
+        Returns [(chunk_id, score), ...] for query i, best first.
+        """
+        valid = self.ids[i] >= 0
+        return list(zip(self.ids[i][valid].tolist(), self.scores[i][valid].tolist()))
+
+    def chunks(self, i):
+        """
+        Returns the chunk texts for query i, best first.
+        """
+        return [self._store.get_chunk(chunk_id) for chunk_id in self.ids[i][self.ids[i] >= 0].tolist()]
+
+
 class VectorStore:
-    def __init__(self, embedding_dim):
+    def __init__(self, embedding_dim, index_type="flat", codec="float32", rerank_factor=0,
+                 train_size=100_000, compact_threshold=0.25, tracer=None, **index_params):
         """
         Initializes a FAISS index for storing embeddings.
+
+        index_type is one of INDEX_TYPES and codec one of CODECS; index_params
+        are passed to build_index(). Trainable indexes are trained on up to
+        train_size vectors sampled from the first add_embeddings() call unless
+        train() was called explicitly. Deleted chunks are compacted away once
+        they make up more than compact_threshold of the stored rows. Searches
+        and adds are traced on tracer, or the process-wide tracer if None.
+
+        With rerank_factor > 0 the full-precision vectors are kept as well
+        (memory mapped from disk once the store is saved and loaded) and each
+        search fetches top_k * rerank_factor candidates from the compressed
+        index, then re-ranks them by exact distance; with 1 only the order of
+        the top_k is corrected.
         """
-        self.index = faiss.IndexFlatL2(embedding_dim)
-        self.text_chunks = []
+        self.embedding_dim = embedding_dim
+        self.index_type = index_type
+        self.codec = codec
+        self.rerank_factor = rerank_factor
+        self.train_size = train_size
+        self.compact_threshold = compact_threshold
+        self.index_params = index_params
+        self.index = self._new_index()
+        # Row-aligned chunk storage; chunk ids are assigned in increasing order
+        # so _ids stays sorted and id -> row is a binary search
+        self.text_chunks = PackedStrings()
+        self.metadatas = PackedStrings()  # JSON-encoded, one entry per chunk
+        self._ids = GrowableArray("int64")
+        self._doc_codes = GrowableArray("int32")  # index into documents, -1 for none
+        self._alive = GrowableArray("bool")
+        # Full-precision vectors for re-ranking, row-aligned with _ids
+        self._vectors = GrowableArray("float32", row_shape=(embedding_dim,)) if rerank_factor > 0 else None
+        self.documents = PackedStrings()
+        self._doc_lookup = {}
+        self._next_id = 0
+        self._live_count = 0
+        self.version = 0  # bumped on every add or delete, e.g. for cache invalidation
+        self._mapped = False  # True while the index is a read-only memory map
+        self._tombstone_selector = None
+        self.tracer = tracer
+
+    def __len__(self):
+        return self._live_count
 
-    def add_embeddings(self, embeddings, chunks):
+    def add_embeddings(self, embeddings, chunks, metadatas=None, doc_id=None):
         """
         Adds embeddings and corresponding text chunks to the index.
+
+        Returns the stable chunk ids assigned to them. Chunks added with a
+        doc_id can later be removed or replaced together.
         """
-        self.index.add(np.array(embeddings).astype("float32"))
+        with (self.tracer or get_tracer()).span("vector_store.add", count=len(chunks)):
+            return self._add_embeddings(embeddings, chunks, metadatas, doc_id)
+
+    def _add_embeddings(self, embeddings, chunks, metadatas, doc_id):
+        self._ensure_writable()
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if not self.index.is_trained:
+            self.train(embeddings)
+        ids = np.arange(self._next_id, self._next_id + len(embeddings), dtype="int64")
+        self.index.add_with_ids(embeddings, ids)
+        self._next_id += len(ids)
+        self._live_count += len(ids)
+        self.version += 1
+
         self.text_chunks.extend(chunks)
+        if metadatas is None:
+            metadatas = [None] * len(chunks)
+        self.metadatas.extend(json.dumps(metadata) for metadata in metadatas)
+        self._ids.extend(ids)
+        self._doc_codes.extend(np.full(len(ids), self._doc_code(doc_id), dtype="int32"))
+        self._alive.extend(np.ones(len(ids), dtype="bool"))
+        if self._vectors is not None:
+            self._vectors.extend(embeddings)
+        return ids
+
+    def delete_document(self, doc_id):
+        """
+        Removes every chunk added under doc_id. Returns the number removed.
+        """
+        code = self._doc_lookup.get(doc_id)
+        if code is None:
+            return 0
+        rows = np.flatnonzero((self._doc_codes.view() == code) & self._alive.view())
+        self.delete_chunks(self._ids.view()[rows])
+        return len(rows)
+
+    def delete_chunks(self, chunk_ids):
+        """
+        Removes chunks by id. Unknown or already deleted ids are ignored.
+        """
+        self._ensure_writable()
+        rows = self._rows_for(np.asarray(chunk_ids, dtype="int64"))
+        rows = rows[rows >= 0]
+        if len(rows) == 0:
+            return
+        if self._supports_remove():
+            self.index.remove_ids(self._ids.view()[rows])
+        self._alive.make_writable()
+        self._alive.view()[rows] = False
+        self._live_count -= len(rows)
+        self.version += 1
+        self._tombstone_selector = None
+        if self.dead_fraction > self.compact_threshold:
+            self.compact()
+
+    def upsert_document(self, doc_id, embeddings, chunks, metadatas=None):
+        """
+        Replaces all chunks of doc_id with new ones. Returns the new chunk ids.
+        """
+        self.delete_document(doc_id)
+        return self.add_embeddings(embeddings, chunks, metadatas, doc_id=doc_id)
+
+    @property
+    def dead_fraction(self):
+        """
+        Fraction of stored rows that belong to deleted chunks.
+        """
+        return 1.0 - self._live_count / len(self._ids) if len(self._ids) else 0.0
+
+    def compact(self):
+        """
+        Drops deleted chunks from text and metadata storage and, for indexes
+        that cannot remove vectors in place (HNSW), rebuilds the index from
+        the surviving vectors. Chunk ids are preserved.
+        """
+        self._ensure_writable()
+        live_rows = np.flatnonzero(self._alive.view())
+        if len(live_rows) == len(self._ids):
+            return
+        live_ids = self._ids.view()[live_rows]
+        if not self._supports_remove():
+            # Rebuild from the exact vectors when kept; reconstruct() decodes lossy codes
+            if self._vectors is not None:
+                vectors = np.ascontiguousarray(self._vectors.view()[live_rows])
+            elif len(live_ids):
+                vectors = np.vstack([self.index.reconstruct(int(i)) for i in live_ids])
+            else:
+                vectors = None
+            self.index = self._new_index()
+            if vectors is not None and len(vectors):
+                if not self.index.is_trained:
+                    self.train(vectors)
+                self.index.add_with_ids(vectors, live_ids)
+        self.text_chunks = self.text_chunks.take(live_rows)
+        self.metadatas = self.metadatas.take(live_rows)
+        self._ids = GrowableArray("int64", live_ids.copy())
+        self._doc_codes = GrowableArray("int32", self._doc_codes.view()[live_rows].copy())
+        self._alive = GrowableArray("bool", np.ones(len(live_rows), dtype="bool"))
+        if self._vectors is not None:
+            self._vectors = GrowableArray("float32", self._vectors.view()[live_rows])
+        self._tombstone_selector = None
+
+    def training_sizes(self):
+        """
+        Returns (minimum, recommended) numbers of vectors for train(): FAISS
+        needs at least one per centroid (IVF lists, PQ codewords) and wants
+        about 39 per centroid; the recommendation is also at least 1000, so
+        int8 value ranges are representative, and at most train_size. Both
+        are 0 if the index is already trained.
+        """
+        if self.index.is_trained:
+            return 0, 0
+        centroids = 1
+        if self.index_type.startswith("ivf"):
+            centroids = faiss.extract_index_ivf(self.index).nlist
+        if self.index_type == "ivf_pq" or self.codec == "pq":
+            centroids = max(centroids, 1 << self.index_params.get("pq_nbits", 8))
+        return centroids, max(centroids, min(self.train_size, max(39 * centroids, 1000)))
+
+    def train(self, sample):
+        """
+        Trains the index (IVF centroids, PQ codebooks) on a sample of vectors.
+        """
+        sample = np.ascontiguousarray(sample, dtype="float32")
+        if len(sample) > self.train_size:
+            rows = np.random.default_rng(0).choice(len(sample), self.train_size, replace=False)
+            sample = sample[np.sort(rows)]
+        self.index.train(sample)
 
-    def search(self, query_embedding, top_k=5):
+    def get_chunk(self, chunk_id):
+        """
+        Returns the text of a chunk by id.
+        """
+        return self.text_chunks[self._row(chunk_id)]
+
+    def get_metadata(self, chunk_id):
+        """
+        Returns the metadata stored with a chunk, or None.
+        """
+        return json.loads(self.metadatas[self._row(chunk_id)])
+
+    def document_chunk_ids(self, doc_id):
+        """
+        Returns the ids of the live chunks of a document.
+        """
+        code = self._doc_lookup.get(doc_id)
+        if code is None:
+            return np.zeros(0, dtype="int64")
+        return self._ids.view()[(self._doc_codes.view() == code) & self._alive.view()]
+
+    def iter_metadata(self):
+        """
+        Yields (chunk_id, metadata) for every live chunk.
+        """
+        alive = self._alive.view()
+        for row, chunk_id in enumerate(self._ids.view().tolist()):
+            if alive[row]:
+                yield chunk_id, json.loads(self.metadatas[row])
+
+    def search(self, query_embedding, top_k=5, nprobe=None, ef_search=None, id_filter=None, rerank=None):
         """
         Searches the index for top_k similar embeddings.
+
+        nprobe (IVF) and ef_search (HNSW) trade recall for latency on this
+        query only. id_filter restricts the search to the given chunk ids,
+        e.g. candidates from MetadataIndex.compile(). Only the final top_k
+        chunk texts are read from storage.
+        """
+        query_embedding = np.asarray(query_embedding, dtype="float32").reshape(1, -1)
+        return self.search_batch(query_embedding, top_k, nprobe, ef_search, id_filter, rerank).chunks(0)
+
+    def search_batch(self, query_matrix, top_k=5, nprobe=None, ef_search=None, id_filter=None, rerank=None):
+        """
+        Searches for N queries in a single FAISS call.
+
+        query_matrix is an (N, dim) array; a C-contiguous float32 array is
+        passed to FAISS without copying. id_filter is pushed into FAISS as an
+        IDSelector so only those chunk ids are considered; a flat index with
+        the "pq" codec cannot take one, so there the search is widened until
+        enough allowed ids come back. rerank overrides the store's
+        rerank_factor for this call (0 disables re-ranking). Returns
+        SearchResults; an empty store returns no hits for any index type.
+        """
+        query_matrix = np.ascontiguousarray(query_matrix, dtype="float32")
+        if query_matrix.ndim != 2 or query_matrix.shape[1] != self.embedding_dim:
+            raise ValueError(f"expected queries of shape (N, {self.embedding_dim}), got {query_matrix.shape}")
+        # An untrained IVF index cannot be searched; nothing is indexed yet anyway
+        if self.index.ntotal == 0 or (id_filter is not None and len(id_filter) == 0):
+            empty_ids = np.full((len(query_matrix), top_k), -1, dtype="int64")
+            return SearchResults(empty_ids, np.full(empty_ids.shape, np.inf, dtype="float32"), self)
+        factor = self.rerank_factor if rerank is None else rerank
+        rerank = factor > 0 and self._vectors is not None
+        fetch_k = top_k * factor if rerank else top_k
+        tracer = self.tracer or get_tracer()
+        with tracer.span("vector_store.search", queries=len(query_matrix), top_k=top_k):
+            params = self._search_params(nprobe, ef_search, id_filter)
+            if params is not None and not self._supports_search_params():
+                scores, ids = self._search_post_filtered(query_matrix, fetch_k, id_filter)
+            else:
+                scores, ids = self.index.search(query_matrix, fetch_k, params=params)
+        if rerank:
+            with tracer.span("vector_store.rerank", candidates=fetch_k):
+                ids, scores = self._rerank(query_matrix, ids, top_k)
+        scores[ids < 0] = np.inf
+        if tracer.enabled:
+            candidates = self._live_count if id_filter is None else len(id_filter)
+            tracer.count("vector_store.candidates", candidates * len(query_matrix))
+            tracer.count("vector_store.returned", int(np.count_nonzero(ids >= 0)))
+        return SearchResults(ids, scores, self)
+
+    def evaluate_recall(self, base_vectors, query_vectors, top_k=10, nprobe=None, ef_search=None, rerank=None):
+        """
+        Measures recall@k of this index against exact search.
+
+        base_vectors must be the vectors of the live chunks, in the order they
+        were added; query_vectors should be held out from them. Returns
+        recall@k and the mean per-query latency of the approximate search
+        (including any re-ranking) in milliseconds.
+        """
+        base_vectors = np.ascontiguousarray(base_vectors, dtype="float32")
+        query_vectors = np.ascontiguousarray(query_vectors, dtype="float32")
+        exact = faiss.IndexFlatL2(self.embedding_dim)
+        exact.add(base_vectors)
+        _, truth = exact.search(query_vectors, top_k)
+        live_ids = self._ids.view()[self._alive.view()]
+        truth = np.where(truth >= 0, live_ids[truth], -1)
+
+        started = time.perf_counter()
+        found = self.search_batch(query_vectors, top_k, nprobe, ef_search, rerank=rerank).ids
+        elapsed = time.perf_counter() - started
+
+        hits = sum(len(np.intersect1d(t[t >= 0], f[f >= 0])) for t, f in zip(truth, found))
+        return {
+            "recall": hits / float(truth.size),
+            "latency_ms": 1000.0 * elapsed / len(query_vectors),
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+        }
+
+    @property
+    def bytes_per_vector(self):
+        """
+        Approximate in-memory bytes per stored vector (codes, ids, graph links).
+        """
+        return self.storage_report()["bytes_per_vector"]
+
+    def storage_report(self):
+        """
+        Breaks down the per-vector footprint of the index.
+
+        Full-precision re-rank vectors and chunk texts are reported separately
+        since they are memory mapped from disk when the store is loaded.
+        """
+        if self.index_type.startswith("ivf"):
+            code_bytes = faiss.extract_index_ivf(self.index).code_size
+            id_bytes = 8  # stored in the inverted lists
+            graph_bytes = 0
+        else:
+            inner = faiss.downcast_index(self.index.index)
+            id_bytes = 16  # IndexIDMap2 forward and reverse maps
+            graph_bytes = 0
+            if self.index_type == "hnsw":
+                graph_bytes = 4 * inner.hnsw.nb_neighbors(0)  # level-0 links dominate
+                inner = faiss.downcast_index(inner.storage)
+            code_bytes = inner.code_size
+        rows = len(self._ids)
+        return {
+            "index_type": self.index_type,
+            "codec": self.codec,
+            "code_bytes": code_bytes,
+            "id_bytes": id_bytes,
+            "graph_bytes": graph_bytes,
+            "bytes_per_vector": code_bytes + id_bytes + graph_bytes,
+            "compression": 4.0 * self.embedding_dim / code_bytes,
+            "rerank_bytes_per_vector": 4 * self.embedding_dim if self._vectors is not None else 0,
+            "text_bytes_per_vector": self.text_chunks._nbytes / rows if rows else 0.0,
+        }
+
+    def tune(self, base_vectors, query_vectors, top_k=10, values=(1, 2, 4, 8, 16, 32, 64, 128)):
+        """
+        Sweeps nprobe (IVF) or ef_search (HNSW) and returns one
+        evaluate_recall() result per value, to pick an operating point.
+        """
+        if self.index_type.startswith("ivf"):
+            knob = "nprobe"
+        elif self.index_type == "hnsw":
+            knob = "ef_search"
+        else:
+            return [self.evaluate_recall(base_vectors, query_vectors, top_k)]
+        return [self.evaluate_recall(base_vectors, query_vectors, top_k, **{knob: value})
+                for value in values]
+
+    def save(self, path):
         """
-        query_embedding = np.array([query_embedding]).astype("float32")
-        distances, indices = self.index.search(query_embedding, top_k)
-        results = [self.text_chunks[i] for i in indices[0]]
-        return results
\ No newline at end of file
+        Writes the index, chunk texts and metadata to a directory.
+
+        Each save goes into a fresh snapshot subdirectory, and replacing
+        manifest.json, which names the snapshot, publishes it atomically. A
+        concurrent load() therefore sees either the old or the new snapshot,
+        never a mix. The previous snapshot is kept for loads already in
+        flight; older ones are removed.
+        """
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        previous = _read_manifest(path).get("snapshot", "") if os.path.exists(manifest_path) else None
+        snapshot = tempfile.mkdtemp(prefix=SNAPSHOT_PREFIX, dir=path)
+        faiss.write_index(self.index, os.path.join(snapshot, INDEX_FILE))
+        self.text_chunks.save(snapshot, "chunks")
+        self.metadatas.save(snapshot, "metadata")
+        self.documents.save(snapshot, "documents")
+        self._ids.save(os.path.join(snapshot, "chunk_ids.npy"))
+        self._doc_codes.save(os.path.join(snapshot, "doc_codes.npy"))
+        self._alive.save(os.path.join(snapshot, "alive.npy"))
+        if self._vectors is not None:
+            self._vectors.save(os.path.join(snapshot, "vectors.npy"))
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump({"format_version": FORMAT_VERSION,
+                       "snapshot": os.path.basename(snapshot),
+                       "embedding_dim": self.embedding_dim,
+                       "index_type": self.index_type,
+                       "codec": self.codec,
+                       "rerank_factor": self.rerank_factor,
+                       "index_params": self.index_params,
+                       "train_size": self.train_size,
+                       "compact_threshold": self.compact_threshold,
+                       "next_id": self._next_id,
+                       "version": self.version,
+                       "count": self._live_count}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_path + ".tmp", manifest_path)
+        _remove_old_snapshots(path, keep=(os.path.basename(snapshot), previous))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a store written by save().
+
+        With mmap=True the index vectors, chunk texts and metadata are memory
+        mapped rather than read, so startup does not scale with corpus size and
+        processes loading the same directory share one page-cached copy. The
+        first modification copies the index into private memory. Re-rank
+        vectors are memory mapped too, so only the candidate rows a search
+        touches are read.
+        """
+        while True:
+            manifest = _read_manifest(path)
+            # Version 2 stores predate codecs and are plain float32 indexes;
+            # versions 2 and 3 keep their files directly in path, not in a snapshot
+            if manifest["format_version"] not in (2, 3, FORMAT_VERSION):
+                raise ValueError(f"unsupported vector store format {manifest['format_version']}")
+            try:
+                return cls._load_snapshot(os.path.join(path, manifest.get("snapshot", "")), manifest, mmap)
+            except (OSError, RuntimeError):
+                # The snapshot was removed by later saves while loading; retry
+                # with the current one, or fail if it is still the same
+                if _read_manifest(path).get("snapshot") == manifest.get("snapshot"):
+                    raise
+
+    @classmethod
+    def _load_snapshot(cls, path, manifest, mmap):
+        store = cls.__new__(cls)
+        store.embedding_dim = manifest["embedding_dim"]
+        store.index_type = manifest["index_type"]
+        store.codec = manifest.get("codec", "float32")
+        store.rerank_factor = manifest.get("rerank_factor", 0)
+        store.index_params = manifest["index_params"]
+        store.train_size = manifest["train_size"]
+        store.compact_threshold = manifest["compact_threshold"]
+        store._next_id = manifest["next_id"]
+        store._live_count = manifest["count"]
+        store.version = manifest["version"]
+        index_path = os.path.join(path, INDEX_FILE)
+        store.index = faiss.read_index(index_path, _mmap_flags() if mmap else 0)
+        store._mapped = mmap
+        store._tombstone_selector = None
+        store.tracer = None
+        store.text_chunks = PackedStrings.load(path, "chunks", mmap=mmap)
+        store.metadatas = PackedStrings.load(path, "metadata", mmap=mmap)
+        store.documents = PackedStrings.load(path, "documents", mmap=mmap)
+        store._doc_lookup = {name: code for code, name in enumerate(store.documents)}
+        store._ids = GrowableArray.load(os.path.join(path, "chunk_ids.npy"), mmap=mmap)
+        store._doc_codes = GrowableArray.load(os.path.join(path, "doc_codes.npy"), mmap=mmap)
+        store._alive = GrowableArray.load(os.path.join(path, "alive.npy"), mmap=mmap)
+        vectors_path = os.path.join(path, "vectors.npy")
+        store._vectors = GrowableArray.load(vectors_path, mmap=mmap) if store.rerank_factor > 0 else None
+        return store
+
+    def _ensure_writable(self):
+        # Memory-mapped FAISS storage cannot grow in place; copy it privately
+        if self._mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._mapped = False
+
+    def _new_index(self):
+        index = build_index(self.embedding_dim, self.index_type, self.codec, **self.index_params)
+        # IVF indexes store ids natively; an IndexIDMap2 around them would go
+        # out of sync on remove_ids because IVF does not renumber its entries
+        if self.index_type.startswith("ivf"):
+            return index
+        return faiss.IndexIDMap2(index)
+
+    def _supports_remove(self):
+        # HNSW graphs cannot drop nodes; deleted ids are filtered at search
+        # time until compact() rebuilds the graph
+        return self.index_type != "hnsw"
+
+    def _doc_code(self, doc_id):
+        if doc_id is None:
+            return -1
+        code = self._doc_lookup.get(doc_id)
+        if code is None:
+            code = len(self.documents)
+            self.documents.extend([doc_id])
+            self._doc_lookup[doc_id] = code
+        return code
+
+    def _rows_for(self, chunk_ids):
+        # Rows of live chunks, -1 where the id is unknown or deleted
+        ids = self._ids.view()
+        if len(ids) == 0:
+            return np.full(len(chunk_ids), -1, dtype="int64")
+        rows = np.searchsorted(ids, chunk_ids)
+        rows[rows >= len(ids)] = 0
+        found = (ids[rows] == chunk_ids) & self._alive.view()[rows]
+        return np.where(found, rows, -1)
+
+    def _row(self, chunk_id):
+        row = self._rows_for(np.array([chunk_id], dtype="int64"))[0]
+        if row < 0:
+            raise KeyError(f"no chunk with id {chunk_id}")
+        return int(row)
+
+    def _supports_search_params(self):
+        # IndexPQ rejects any SearchParameters, including an IDSelector
+        return not (self.index_type == "flat" and self.codec == "pq")
+
+    def _search_post_filtered(self, queries, k, id_filter):
+        """
+        Searches without a selector and keeps only ids in id_filter, doubling
+        the number fetched until every query has k allowed hits or the whole
+        index was scanned. Results match a selector-based search.
+        """
+        allowed = np.unique(np.asarray(id_filter, dtype="int64"))
+        total = self.index.ntotal
+        # Start from the expected oversampling for this filter's selectivity
+        fetch = min(total, max(4 * k, -(-2 * k * total // len(allowed))))
+        while True:
+            scores, ids = self.index.search(queries, max(fetch, 1))
+            keep = np.isin(ids, allowed)
+            if fetch >= total or (keep.sum(axis=1) >= k).all():
+                break
+            fetch = min(total, 2 * fetch)
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :k]  # allowed hits first, best first
+        kept = np.take_along_axis(keep, order, axis=1)
+        ids = np.where(kept, np.take_along_axis(ids, order, axis=1), -1)
+        scores = np.where(kept, np.take_along_axis(scores, order, axis=1), np.inf).astype("float32")
+        if ids.shape[1] < k:
+            pad = k - ids.shape[1]
+            ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=np.inf)
+        return scores, ids
+
+    def _rerank(self, queries, ids, top_k):
+        """
+        Re-orders candidate ids by exact L2 distance and keeps the best top_k.
+        """
+        rows = self._rows_for(ids.ravel()).reshape(ids.shape)
+        valid = rows >= 0
+        # Only the candidate rows are gathered, so a memory map reads just those pages
+        candidates = self._vectors.view()[np.where(valid, rows, 0)]
+        diff = candidates - queries[:, None, :]
+        distances = np.einsum("nkd,nkd->nk", diff, diff)
+        distances[~valid] = np.inf
+        order = np.argsort(distances, axis=1, kind="stable")[:, :top_k]
+        ids = np.take_along_axis(np.where(valid, ids, -1), order, axis=1)
+        return ids, np.take_along_axis(distances, order, axis=1)
+
+    def _search_params(self, nprobe=None, ef_search=None, id_filter=None):
+        """
+        Builds per-query FAISS search parameters, leaving the index untouched.
+        """
+        sel = self._deleted_selector()
+        if id_filter is not None:
+            allowed = faiss.IDSelectorBatch(np.ascontiguousarray(id_filter, dtype="int64"))
+            if sel is not None:
+                combined = faiss.IDSelectorAnd(allowed, sel)
+                combined.referenced_objects = [allowed, sel]
+                allowed = combined
+            sel = allowed
+        if self.index_type.startswith("ivf"):
+            if ef_search is not None:
+                raise ValueError("ef_search applies to HNSW indexes; use nprobe for IVF")
+            if nprobe is None and sel is None:
+                return None
+            ivf = faiss.extract_index_ivf(self.index)
+            params = faiss.SearchParametersIVF(nprobe=nprobe if nprobe is not None else ivf.nprobe)
+        elif self.index_type == "hnsw":
+            if nprobe is not None:
+                raise ValueError("nprobe applies to IVF indexes; use ef_search for HNSW")
+            if ef_search is None and sel is None:
+                return None
+            hnsw = faiss.downcast_index(self.index.index).hnsw
+            params = faiss.SearchParametersHNSW(efSearch=ef_search if ef_search is not None else hnsw.efSearch)
+        else:
+            if nprobe is not None or ef_search is not None:
+                raise ValueError("nprobe / ef_search do not apply to a flat index")
+            if sel is None:
+                return None
+            params = faiss.SearchParameters()
+        if sel is not None:
+            params.sel = sel
+            params.referenced_objects = [sel]  # keep the selector alive with the params
+        return params
+
+    def _deleted_selector(self):
+        if self._supports_remove() or self._live_count == len(self._ids):
+            return None
+        if self._tombstone_selector is None:
+            dead = faiss.IDSelectorBatch(np.ascontiguousarray(self._ids.view()[~self._alive.view()]))
+            self._tombstone_selector = faiss.IDSelectorNot(dead)
+            self._tombstone_selector.referenced_objects = [dead]
+        return self._tombstone_selector
+
+
+def _save_array(file_path, array):
+    # Write beside the target and rename, so readers that have the old file
+    # memory mapped keep a consistent view
+    with open(file_path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(file_path + ".tmp", file_path)
+
+
+def _read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def _remove_old_snapshots(path, keep):
+    for entry in os.listdir(path):
+        if entry.startswith(SNAPSHOT_PREFIX) and entry not in keep:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+    if "" not in keep:
+        # Files of a pre-snapshot (version 2 or 3) store written directly in path
+        for entry in _LEGACY_FILES:
+            try:
+                os.remove(os.path.join(path, entry))
+            except OSError:
+                pass
+
+
+def _mmap_flags():
+    # IO_FLAG_MMAP_IFC maps flat vector codes directly (faiss >= 1.9)
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def compare_codecs(base_vectors, query_vectors, index_type="flat", codecs=CODECS, top_k=10,
+                   rerank_factor=4, **index_params):
+    """
+    Builds one store per codec over base_vectors and reports its footprint
+    and recall@top_k against exact search, with and without re-ranking.
+    """
+    base_vectors = np.ascontiguousarray(base_vectors, dtype="float32")
+    report = []
+    for codec in codecs:
+        store = VectorStore(base_vectors.shape[1], index_type, codec=codec, rerank_factor=rerank_factor,
+                            train_size=len(base_vectors), **index_params)
+        store.add_embeddings(base_vectors, [""] * len(base_vectors))
+        plain = store.evaluate_recall(base_vectors, query_vectors, top_k, rerank=0)
+        entry = {
+            "codec": codec,
+            "bytes_per_vector": store.bytes_per_vector,
+            "compression": store.storage_report()["compression"],
+            "recall": plain["recall"],
+            "latency_ms": plain["latency_ms"],
+        }
+        if rerank_factor > 0:
+            reranked = store.evaluate_recall(base_vectors, query_vectors, top_k)
+            entry["recall_reranked"] = reranked["recall"]
+            entry["latency_reranked_ms"] = reranked["latency_ms"]
+        report.append(entry)
+    return report